@@ -1,26 +1,25 @@
 """
 Fix truncated commentaries in Pinecone.
 Updates only the commentary field, preserving all other metadata including summaries.
+Run from backend/: python -m archive.fix_commentary
 """
 import os
-import pickle
 from dotenv import load_dotenv
 from pinecone import Pinecone
 from tqdm import tqdm
 
+from verse_table import load_verses
+
 load_dotenv()
 
 pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
 index = pc.Index(os.getenv("PINECONE_INDEX"))
 
-embeddings_folder = 'embeddings'
-
 
 def fix_commentaries():
     # Load verses with full commentary
     print("Loading verses...")
-    with open(os.path.join(embeddings_folder, 'verses.pkl'), 'rb') as f:
-        verses = pickle.load(f)
+    verses = load_verses()
 
     print(f"Found {len(verses)} verses")
 
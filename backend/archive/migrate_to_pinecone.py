@@ -1,23 +1,23 @@
+"""
+Upload the verse corpus (verses + embeddings) to Pinecone.
+Run from backend/: python -m archive.migrate_to_pinecone
+"""
 import os
-import pickle
 from dotenv import load_dotenv
 from pinecone import Pinecone
 from tqdm import tqdm
 
+from verse_table import load_corpus
+
 load_dotenv()
 
 pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
 index = pc.Index(os.getenv("PINECONE_INDEX"))
 
-embeddings_folder = 'embeddings'
-
 def migrate():
     # Load existing embeddings
     print("Loading existing embeddings...")
-    with open(os.path.join(embeddings_folder, 'embeddings.pkl'), 'rb') as f:
-        embeddings = pickle.load(f)
-    with open(os.path.join(embeddings_folder, 'verses.pkl'), 'rb') as f:
-        verses = pickle.load(f)
+    verses, embeddings = load_corpus()
 
     print(f"Found {len(verses)} verses to upload")
 
@@ -28,7 +28,7 @@ def migrate():
 
         vectors.append({
             "id": vector_id,
-            "values": embedding.tolist(),
+            "values": embedding.astype("float32").tolist(),
             "metadata": {
                 "chapter": verse['chapter'],
                 "verse": verse['verse'],
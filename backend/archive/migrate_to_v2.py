@@ -1,9 +1,14 @@
+"""
+Re-embed every vector of the old 384-dim index with BGE into the v2 index.
+Run from backend/: python -m archive.migrate_to_v2
+"""
 import os
 from dotenv import load_dotenv
 from pinecone import Pinecone
-from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
 
+from corpus_embeddings import document_text, embed_documents
+
 load_dotenv()
 
 # Initialize Pinecone
@@ -11,10 +16,6 @@ pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
 old_index = pc.Index(os.getenv("PINECONE_INDEX"))  # gitachat (384-dim)
 new_index = pc.Index(os.getenv("PINECONE_INDEX_V2"))  # gitachat-v2 (768-dim)
 
-# New embedding model
-print("Loading BGE embedding model...")
-model = SentenceTransformer("BAAI/bge-base-en-v1.5")
-
 
 def fetch_all_vectors():
     """Fetch all vectors from the old index."""
@@ -53,26 +54,17 @@ def embed_and_upload(vectors):
     """Re-embed all vectors with BGE and upload to new index."""
     print("\nRe-embedding with BGE model and uploading to new index...")
 
-    new_vectors = []
-
-    for v in tqdm(vectors, desc="Embedding"):
-        metadata = v["metadata"]
-
-        # Combine translation and summary for embedding
-        translation = metadata.get("translation", "")
-        summary = metadata.get("summary", "")
-        text_to_embed = f"{translation} {summary}"
-
-        # BGE instruction prefix for documents
-        text_with_instruction = f"Represent this document for retrieval: {text_to_embed}"
-
-        # Generate new embedding
-        embedding = model.encode(text_with_instruction).tolist()
+    # Translation + summary with the BGE document instruction, in length-sorted batches
+    embeddings = embed_documents(
+        [document_text({"translation": "", **v["metadata"]}) for v in vectors]
+    )
 
+    new_vectors = []
+    for v, embedding in zip(vectors, embeddings):
         new_vectors.append({
             "id": v["id"],
-            "values": embedding,
-            "metadata": metadata  # Keep all existing metadata
+            "values": embedding.tolist(),
+            "metadata": v["metadata"]  # Keep all existing metadata
         })
 
     # Upload in batches
@@ -1,26 +1,23 @@
 """
 Upload missing verses to Pinecone.
-These verses exist in the pickle files but were never uploaded.
+These verses exist in the local corpus (embeddings/) but were never uploaded.
+Run from backend/: python -m archive.upload_missing_verses
 """
 import os
-import pickle
 from dotenv import load_dotenv
 from pinecone import Pinecone
 from openai import OpenAI
-from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
 
+from corpus_embeddings import document_text, embed_documents
+from verse_table import load_verses
+
 load_dotenv()
 
 client = OpenAI(api_key=os.getenv("GPT_KEY"))
 pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
 index = pc.Index(os.getenv("PINECONE_INDEX"))
 
-# Use the same model as model.py (768-dim)
-embedding_model = SentenceTransformer("BAAI/bge-base-en-v1.5")
-
-embeddings_folder = 'embeddings'
-
 
 def summarize(commentary_text):
     """Generate a summary of the commentary using GPT-4o-mini."""
@@ -39,14 +36,11 @@ def summarize(commentary_text):
 
 
 def upload_missing():
-    # Load verses and embeddings
-    print("Loading verses and embeddings...")
-    with open(os.path.join(embeddings_folder, 'embeddings.pkl'), 'rb') as f:
-        embeddings = pickle.load(f)
-    with open(os.path.join(embeddings_folder, 'verses.pkl'), 'rb') as f:
-        verses = pickle.load(f)
+    # Load verses (embeddings are recomputed below, with the summary)
+    print("Loading verses...")
+    verses = load_verses()
 
-    print(f"Total verses in pickle: {len(verses)}")
+    print(f"Total verses in corpus: {len(verses)}")
 
     # Find missing verses
     missing = []
@@ -62,18 +56,18 @@ def upload_missing():
         print("No missing verses to upload!")
         return
 
+    # Summaries first, then one batched embedding pass over the same document
+    # text as every other verse
+    summaries = [summarize(verse['commentary']) for i, verse in tqdm(missing, desc="Summarizing")]
+    embeddings = embed_documents(
+        [document_text({**verse, "summary": summary}) for (i, verse), summary in zip(missing, summaries)]
+    )
+
     # Upload missing verses
     vectors = []
-    for i, verse in tqdm(missing, desc="Processing missing verses"):
+    for (i, verse), summary, embedding in zip(missing, summaries, embeddings):
         vector_id = f"ch{verse['chapter']}_v{verse['verse']}"
 
-        # Generate embedding using BGE model (768-dim)
-        text_to_embed = f"{verse['translation']} {verse['commentary']}"
-        embedding = embedding_model.encode(text_to_embed)
-
-        # Generate summary
-        summary = summarize(verse['commentary'])
-
         vectors.append({
             "id": vector_id,
             "values": embedding.tolist(),
@@ -0,0 +1,123 @@
+"""
+Dynamic micro-batching of query embeddings.
+Queries that arrive within a short window (or until the batch is full) are
+encoded together in one SentenceTransformer forward pass, and each waiting
+request gets its own row back.
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+from pipeline import run_in_stage
+
+
+def _percentile(values, q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+class EmbeddingBatcher:
+    """Collects concurrent encode() calls into batched model.encode() calls."""
+
+    def __init__(self, model, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: list[tuple[str, asyncio.Future, float]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        # The event loop only holds weak references to tasks
+        self._tasks: set[asyncio.Task] = set()
+
+        # Stats
+        self._batches = 0
+        self._items = 0
+        self._batch_sizes: Counter = Counter()
+        self._queue_waits_ms: deque = deque(maxlen=1000)
+        self._encode_ms: deque = deque(maxlen=1000)
+
+    async def encode(self, text: str) -> np.ndarray:
+        """Embed one text, sharing a forward pass with concurrent callers."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error(f"Embedding batch failed: {task.exception()!r}")
+
+    async def aclose(self):
+        """Encode anything still queued and wait for in-flight batches (called on app shutdown)."""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run_batch(self, batch: list[tuple[str, asyncio.Future, float]]):
+        texts = [text for text, _, _ in batch]
+        started = {}
+
+        def encode_batch():
+            # Runs on the embed thread pool; queue wait ends when encoding starts
+            started["at"] = time.perf_counter()
+            return self.model.encode(texts, batch_size=len(texts))
+
+        try:
+            embeddings = await run_in_stage("embed", encode_batch)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        finished = time.perf_counter()
+        self._batches += 1
+        self._items += len(batch)
+        self._batch_sizes[len(batch)] += 1
+        self._encode_ms.append((finished - started["at"]) * 1000)
+        for (_, future, enqueued), embedding in zip(batch, embeddings):
+            self._queue_waits_ms.append((started["at"] - enqueued) * 1000)
+            if not future.done():
+                # A copy, not a row view: callers cache it, and a view would keep
+                # the whole batch matrix alive
+                future.set_result(np.array(embedding, copy=True))
+
+    def stats(self) -> dict:
+        """Batch-size and queue-wait stats for tuning the window and batch size."""
+        waits = list(self._queue_waits_ms)
+        encodes = list(self._encode_ms)
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self._batches,
+            "items": self._items,
+            "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+            "batch_size_counts": dict(sorted(self._batch_sizes.items())),
+            "queue_wait_ms": {
+                "p50": _percentile(waits, 50),
+                "p95": _percentile(waits, 95),
+                "max": max(waits, default=0.0),
+            },
+            "encode_ms": {
+                "p50": _percentile(encodes, 50),
+                "p95": _percentile(encodes, 95),
+            },
+        }
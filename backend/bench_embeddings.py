@@ -0,0 +1,156 @@
+"""
+Parity check and benchmark for the embedding backends.
+Each backend runs in a fresh subprocess so startup time and RSS are measured
+in isolation; embeddings are then compared against the torch reference.
+
+    python bench_embeddings.py --onnx-dir models/bge-base-en-v1.5-onnx
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+SAMPLE_QUERIES = [
+    "how to deal with anxiety",
+    "what is dharma",
+    "I feel anxious about work",
+    "how do I control my anger",
+    "what happens after death",
+    "should I act if I can't control the outcome",
+    "how to find inner peace",
+    "what is the nature of the soul",
+    "why do good people suffer",
+    "how to meditate",
+    "what is true devotion",
+    "how to let go of attachment",
+]
+
+
+def sample_texts(max_docs: int) -> list[str]:
+    """Instruction-prefixed sample queries plus verse documents from the snapshot."""
+    texts = [f"Represent this sentence for searching relevant passages: {q}" for q in SAMPLE_QUERIES]
+    from config import EMBEDDING_DIMENSION, EMBEDDING_MODEL_NAME, SNAPSHOT_DIR
+    from snapshot import StaleSnapshotError, load_snapshot
+
+    try:
+        snapshot = load_snapshot(SNAPSHOT_DIR, EMBEDDING_MODEL_NAME, EMBEDDING_DIMENSION)
+        metadata = snapshot.metadata()[:max_docs]
+        texts += [f"{m['translation']} {m['summary']}" for m in metadata]
+    except (FileNotFoundError, StaleSnapshotError):
+        pass
+    return texts
+
+
+def run_worker(texts_path: str, output_path: str, repeats: int):
+    """Measure one backend (selected via env) and save its embeddings."""
+    started = time.perf_counter()
+    from embedding_backends import load_embedding_model
+
+    model = load_embedding_model()
+    model.encode("warmup")
+    startup_s = time.perf_counter() - started
+
+    with open(texts_path) as f:
+        texts = json.load(f)
+
+    single_ms = []
+    for _ in range(repeats):
+        for text in texts[: len(SAMPLE_QUERIES)]:
+            t0 = time.perf_counter()
+            model.encode(text)
+            single_ms.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    embeddings = np.asarray(model.encode(texts, batch_size=32), dtype=np.float32)
+    batch_s = time.perf_counter() - t0
+    np.save(output_path, embeddings)
+
+    print(json.dumps({
+        "startup_s": round(startup_s, 2),
+        "single_p50_ms": round(float(np.percentile(single_ms, 50)), 2),
+        "single_p95_ms": round(float(np.percentile(single_ms, 95)), 2),
+        "batch_texts_per_s": round(len(texts) / batch_s, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def run_backend(name: str, env_overrides: dict, texts_path: str, repeats: int, workdir: str):
+    output_path = os.path.join(workdir, f"{name}.npy")
+    env = {**os.environ, **env_overrides}
+    proc = subprocess.run(
+        [sys.executable, __file__, "--worker", texts_path, output_path, "--repeats", str(repeats)],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1]), np.load(output_path)
+
+
+def parity(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    """Cosine agreement with the reference, and whether nearest neighbours agree."""
+    ref = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    cand = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosines = (ref * cand).sum(axis=1)
+    same_top1 = (np.argmax(ref @ ref.T - 2 * np.eye(len(ref)), axis=1)
+                 == np.argmax(cand @ cand.T - 2 * np.eye(len(cand)), axis=1))
+    return {
+        "min_cosine": round(float(cosines.min()), 5),
+        "mean_cosine": round(float(cosines.mean()), 5),
+        "nearest_neighbour_agreement": round(float(same_top1.mean()), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare torch and ONNX embedding backends")
+    parser.add_argument("--onnx-dir", default="models/bge-base-en-v1.5-onnx")
+    parser.add_argument("--max-docs", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--worker", nargs=2, metavar=("TEXTS", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker[0], args.worker[1], args.repeats)
+        return
+
+    backends = {
+        "torch": {"EMBEDDING_BACKEND": "torch"},
+        "onnx-fp32": {
+            "EMBEDDING_BACKEND": "onnx",
+            "EMBEDDING_MODEL_PATH": args.onnx_dir,
+            "EMBEDDING_ONNX_FILE": "onnx/model.onnx",
+        },
+        "onnx-int8": {
+            "EMBEDDING_BACKEND": "onnx",
+            "EMBEDDING_MODEL_PATH": args.onnx_dir,
+            "EMBEDDING_ONNX_FILE": "onnx/model_qint8.onnx",
+        },
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        texts_path = os.path.join(workdir, "texts.json")
+        texts = sample_texts(args.max_docs)
+        with open(texts_path, "w") as f:
+            json.dump(texts, f)
+        print(f"Benchmarking on {len(texts)} texts\n")
+
+        reference = None
+        for name, env in backends.items():
+            try:
+                stats, embeddings = run_backend(name, env, texts_path, args.repeats, workdir)
+            except subprocess.CalledProcessError as e:
+                print(f"{name}: failed\n{e.stderr[-2000:]}")
+                continue
+            if reference is None:
+                reference = embeddings
+            else:
+                stats.update(parity(reference, embeddings))
+            print(f"{name}: {json.dumps(stats)}")
+
+
+if __name__ == "__main__":
+    main()
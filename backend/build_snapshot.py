@@ -0,0 +1,124 @@
+"""
+Build the local corpus snapshot (verse metadata + embeddings, see snapshot.py).
+
+    python build_snapshot.py                 # from Pinecone (vectors as indexed)
+    python build_snapshot.py --source json   # from data/ JSON, embedding locally
+
+With --source json, embeddings come from the memory-mapped matrix written by
+embed_corpus.py wherever its row was built from the same text, model and
+instruction; only the other verses are encoded (through the embedding cache).
+
+Run after any upsert so the in-process index (VECTOR_BACKEND=local) matches.
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+import clients
+from config import (
+    DATA_DIR,
+    DOCUMENT_INSTRUCTION,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_DIMENSION,
+    EMBEDDING_MODEL_NAME,
+    EMBEDDINGS_FOLDER,
+    SNAPSHOT_DIR,
+)
+from corpus_embeddings import EmbeddingCache, document_text, embed_documents, model_key
+from embedding_matrix import MATRIX_MANIFEST_FILE, load_embedding_matrix
+from snapshot import content_hash, fetch_from_pinecone, write_snapshot
+from utils import load_verses_from_json
+
+
+def from_pinecone():
+    """Every vector with its values and metadata, all chapters fetched in parallel."""
+    return fetch_from_pinecone(clients.index, EMBEDDING_DIMENSION)
+
+
+def matrix_rows(folder: str, ids: list[str], texts: list[str]) -> tuple[np.ndarray | None, dict[int, int]]:
+    """
+    The embed_corpus.py matrix (memory-mapped) and, for each verse it can
+    supply, verse index -> matrix row: same id, document text, model and
+    instruction.
+    """
+    if not os.path.exists(os.path.join(folder, MATRIX_MANIFEST_FILE)):
+        return None, {}
+    matrix, manifest = load_embedding_matrix(folder)
+    if (
+        manifest.get("model") != model_key()
+        or manifest.get("instruction") != DOCUMENT_INSTRUCTION
+        or "text_hashes" not in manifest
+    ):
+        return None, {}
+    rows = {
+        (vector_id, text_hash): row
+        for row, (vector_id, text_hash) in enumerate(zip(manifest["ids"], manifest["text_hashes"]))
+    }
+    found = {}
+    for i, (vector_id, text) in enumerate(zip(ids, texts)):
+        row = rows.get((vector_id, content_hash(text)))
+        if row is not None:
+            found[i] = row
+    return matrix, found
+
+
+def from_json(data_dir: str, matrix_folder: str):
+    """Verses from data/ JSON, with embeddings from the corpus matrix or the configured model."""
+    verses = load_verses_from_json(data_dir)
+    ids = [f"ch{v['chapter']}_v{v['verse']}" for v in verses]
+    # Same document text as the Pinecone index
+    texts = [document_text(v) for v in verses]
+
+    matrix, found = matrix_rows(matrix_folder, ids, texts)
+    missing = [i for i in range(len(verses)) if i not in found]
+    print(f"{len(found)} of {len(verses)} embeddings from '{matrix_folder}', embedding {len(missing)}...")
+
+    embeddings = np.empty((len(verses), EMBEDDING_DIMENSION), dtype=np.float32)
+    if found:
+        # Only the pages of the rows used are read
+        embeddings[list(found)] = matrix[list(found.values())]
+    if missing:
+        # Unchanged texts still come from the embedding cache
+        cache = EmbeddingCache(EMBEDDING_CACHE_PATH, model_key()) if EMBEDDING_CACHE_PATH else None
+        embeddings[missing] = embed_documents([texts[i] for i in missing], cache=cache)
+    metadata = [
+        {
+            "chapter": v["chapter"],
+            "verse": v["verse"],
+            "translation": v["translation"],
+            "summary": v.get("summary", ""),
+            "commentary": v.get("commentary", ""),
+        }
+        for v in verses
+    ]
+    return ids, embeddings, metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the local corpus snapshot")
+    parser.add_argument("--source", choices=["pinecone", "json"], default="pinecone")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--embeddings", default=EMBEDDINGS_FOLDER,
+                        help="embed_corpus.py matrix to take --source json embeddings from")
+    parser.add_argument("--output", default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.source == "pinecone":
+        print("Fetching all vectors from Pinecone...")
+        ids, embeddings, metadata = from_pinecone()
+    else:
+        ids, embeddings, metadata = from_json(args.data_dir, args.embeddings)
+
+    manifest = write_snapshot(
+        args.output, ids, embeddings, metadata, source=args.source, model=EMBEDDING_MODEL_NAME
+    )
+    print(f"\nDone! Wrote {manifest['count']} vectors to '{args.output}' "
+          f"(version {manifest['checksum']}) in {time.perf_counter() - started:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
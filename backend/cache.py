@@ -0,0 +1,115 @@
+"""
+In-memory caching helpers for GitaChat.
+"""
+
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Fold case, punctuation and whitespace so near-identical queries share a key."""
+    folded = unicodedata.normalize("NFKC", query).casefold()
+    folded = "".join(
+        " " if unicodedata.category(ch).startswith("P") else ch for ch in folded
+    )
+    return _WHITESPACE.sub(" ", folded).strip()
+
+
+class LRUCache:
+    """Thread-safe bounded LRU cache with optional TTL and hit/miss counters."""
+
+    def __init__(self, maxsize: int, ttl_seconds: float = 0):
+        self.maxsize = maxsize
+        self.ttl = ttl_seconds
+        self._data: OrderedDict = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def is_expired(self, stored_at: float) -> bool:
+        return bool(self.ttl) and time.time() - stored_at > self.ttl
+
+    def get(self, key):
+        """Return the cached value, or None on a miss or expired entry."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or self.is_expired(entry[1]):
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, stored_at: float | None = None):
+        """Insert a value, evicting the least recently used entries if full."""
+        with self._lock:
+            self._data[key] = (value, time.time() if stored_at is None else stored_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def items(self) -> list[tuple]:
+        """Snapshot of (key, value, stored_at), least recently used first."""
+        with self._lock:
+            return [(key, value, stored_at) for key, (value, stored_at) in self._data.items()]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def save_embedding_cache(cache: LRUCache, path: str, model_name: str):
+    """Persist an LRUCache of text -> embedding to an .npz file (no pickle)."""
+    entries = [e for e in cache.items() if not cache.is_expired(e[2])]
+    if not entries:
+        return
+    keys, vectors, stored_at = zip(*entries)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Write then rename, so a crash mid-save never leaves a truncated file;
+    # the temp file is per process because every gunicorn worker saves on shutdown
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f,
+            model=np.array(model_name),
+            keys=np.array(keys),
+            vectors=np.stack(vectors).astype(np.float32),
+            stored_at=np.array(stored_at, dtype=np.float64),
+        )
+    os.replace(tmp_path, path)
+
+
+def load_embedding_cache(cache: LRUCache, path: str, model_name: str) -> int:
+    """Warm an LRUCache from a file written by save_embedding_cache."""
+    with np.load(path, allow_pickle=False) as data:
+        if str(data["model"]) != model_name:
+            return 0
+        loaded = 0
+        for key, vector, stored_at in zip(data["keys"], data["vectors"], data["stored_at"]):
+            if not cache.is_expired(stored_at):
+                cache.put(str(key), vector, stored_at=float(stored_at))
+                loaded += 1
+    return loaded
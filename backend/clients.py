@@ -1,24 +1,211 @@
 """
 Shared client initializations for GitaChat backend.
-Centralizes Pinecone, OpenAI, and SentenceTransformer clients.
+Centralizes Pinecone, OpenAI, and SentenceTransformer clients,
+plus the in-memory corpus index loaded from the local snapshot.
+
+Clients are built lazily on first attribute access (`clients.index`,
+`from clients import openai_client`, ...), so a script only pays for what it
+uses. Servers call warm_up() at startup to build everything up front.
+Under gunicorn the master builds only FORK_SAFE_CLIENTS before forking;
+each worker builds the PER_PROCESS_CLIENTS itself.
 """
 
+import logging
+import threading
+import time
+
 from config import (
     PINECONE_API_KEY,
     PINECONE_INDEX,
+    PINECONE_HOST,
+    PINECONE_POOL_SIZE,
+    PINECONE_TIMEOUT_MS,
+    PINECONE_DEADLINE_MS,
+    PINECONE_RETRIES,
+    PINECONE_RETRY_BACKOFF_MS,
+    PINECONE_HEDGE_MS,
+    PINECONE_BREAKER_FAILURES,
+    PINECONE_BREAKER_RESET_SECONDS,
     GPT_KEY,
+    EMBEDDING_BACKEND,
+    EMBED_BATCH_MAX_SIZE,
+    EMBED_BATCH_WAIT_MS,
     EMBEDDING_MODEL_NAME,
+    EMBEDDING_DIMENSION,
+    VECTOR_BACKEND,
+    RERANK_TOP_N,
+    RERANKER_MODEL_NAME,
+    RERANK_BATCH_SIZE,
+    RERANK_CACHE_SIZE,
+    SNAPSHOT_DIR,
+    SNAPSHOT_MAX_AGE_SECONDS,
 )
-from pinecone import Pinecone
-from openai import OpenAI
-from sentence_transformers import SentenceTransformer
 
-# Pinecone client and index
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX)
 
-# OpenAI client with timeout
-openai_client = OpenAI(api_key=GPT_KEY, timeout=30.0)
+def _pc():
+    # Pinecone client
+    from pinecone import Pinecone
+
+    return Pinecone(api_key=PINECONE_API_KEY)
+
+
+def _index():
+    # Connection pool sized for concurrent queries from the search stage
+    return _get("pc").Index(
+        PINECONE_INDEX, host=PINECONE_HOST, connection_pool_maxsize=PINECONE_POOL_SIZE
+    )
+
+
+def _openai_client():
+    # OpenAI client with timeout, for scripts
+    from openai import OpenAI
+
+    return OpenAI(api_key=GPT_KEY, timeout=30.0)
+
+
+def _async_openai_client():
+    # Async OpenAI client with timeout, for the API server
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(api_key=GPT_KEY, timeout=30.0)
+
+
+def _embedding_model():
+    # Embedding model - BGE base (768-dim, top MTEB performance), on torch or ONNX Runtime
+    from embedding_backends import load_embedding_model
+
+    return load_embedding_model(EMBEDDING_BACKEND)
+
+
+def _embedding_batcher():
+    # Micro-batcher in front of the model for concurrent API queries
+    from batching import EmbeddingBatcher
+
+    return EmbeddingBatcher(
+        _get("embedding_model"),
+        max_batch_size=EMBED_BATCH_MAX_SIZE,
+        max_wait_ms=EMBED_BATCH_WAIT_MS,
+    )
+
+
+def _reranker():
+    # Optional cross-encoder over the top fused candidates (RERANK_TOP_N > 0)
+    from reranker import CrossEncoderReranker, load_cross_encoder
+
+    return CrossEncoderReranker(
+        load_cross_encoder(RERANKER_MODEL_NAME),
+        batch_size=RERANK_BATCH_SIZE,
+        cache_size=RERANK_CACHE_SIZE,
+    )
+
+
+def _corpus_index():
+    """All vectors + metadata in memory: from the snapshot, or fetched from Pinecone."""
+    from snapshot import StaleSnapshotError, fetch_from_pinecone, load_snapshot
+    from vector_index import LocalIndex
+
+    try:
+        snapshot = load_snapshot(
+            SNAPSHOT_DIR, EMBEDDING_MODEL_NAME, EMBEDDING_DIMENSION, SNAPSHOT_MAX_AGE_SECONDS
+        )
+        logging.info(f"Loaded snapshot {snapshot.version} with {len(snapshot)} vectors")
+        return LocalIndex(snapshot.ids, snapshot.embeddings, snapshot.metadata(), normalized=True)
+    except FileNotFoundError:
+        logging.warning(f"No snapshot in '{SNAPSHOT_DIR}', fetching corpus from Pinecone")
+    except StaleSnapshotError as e:
+        logging.warning(f"Snapshot in '{SNAPSHOT_DIR}' is stale ({e}), fetching corpus from Pinecone")
+    ids, embeddings, metadata = fetch_from_pinecone(_get("index"), EMBEDDING_DIMENSION)
+    return LocalIndex(ids, embeddings, metadata)
+
+
+def _search_index():
+    # Index used by model.match - in-process, or Pinecone with the in-process one as fallback
+    if VECTOR_BACKEND == "local":
+        return _get("corpus_index")
+    from vector_store import CircuitBreaker, ResilientIndex
+
+    return ResilientIndex(
+        _get("index"),
+        fallback=_get("corpus_index"),
+        timeout_ms=PINECONE_TIMEOUT_MS,
+        deadline_ms=PINECONE_DEADLINE_MS,
+        retries=PINECONE_RETRIES,
+        backoff_ms=PINECONE_RETRY_BACKOFF_MS,
+        hedge_after_ms=PINECONE_HEDGE_MS,
+        breaker=CircuitBreaker(PINECONE_BREAKER_FAILURES, PINECONE_BREAKER_RESET_SECONDS),
+        max_workers=PINECONE_POOL_SIZE,
+    )
+
+
+_FACTORIES = {
+    "pc": _pc,
+    "index": _index,
+    "openai_client": _openai_client,
+    "async_openai_client": _async_openai_client,
+    "embedding_model": _embedding_model,
+    "embedding_batcher": _embedding_batcher,
+    "reranker": _reranker,
+    "corpus_index": _corpus_index,
+    "search_index": _search_index,
+}
+
+# Models and in-memory/memory-mapped data: no sockets, connection pools or
+# threads, so they can be built once and shared by forked workers
+FORK_SAFE_CLIENTS = ("corpus_index", "embedding_model") + (("reranker",) if RERANK_TOP_N else ())
+# Network clients and anything holding pools or event-loop state: one per process
+PER_PROCESS_CLIENTS = ("pc", "index", "search_index", "embedding_batcher", "async_openai_client")
+
+# Clients the API server needs
+SERVER_CLIENTS = FORK_SAFE_CLIENTS + ("search_index", "embedding_batcher", "async_openai_client")
+
+# name -> seconds spent building it, for startup reports
+load_times: dict[str, float] = {}
+_lock = threading.RLock()
+
+
+def _get(name: str):
+    if name in globals():
+        return globals()[name]
+    with _lock:
+        if name not in globals():
+            started = time.perf_counter()
+            instance = _FACTORIES[name]()
+            load_times[name] = time.perf_counter() - started
+            logging.info(f"Initialized {name} in {load_times[name]:.2f}s")
+            # Later lookups hit the module dict directly, skipping __getattr__
+            globals()[name] = instance
+    return globals()[name]
+
+
+def __getattr__(name: str):
+    if name in _FACTORIES:
+        return _get(name)
+    raise AttributeError(f"module 'clients' has no attribute '{name}'")
+
+
+def release(*names: str):
+    """
+    Close and forget built clients, so the next access builds new ones. The
+    gunicorn master calls this before forking (the corpus may have been
+    fetched from Pinecone), so no connection pool is inherited by workers.
+    """
+    with _lock:
+        for name in names:
+            client = globals().pop(name, None)
+            load_times.pop(name, None)
+            if hasattr(client, "close"):
+                client.close()
+            elif hasattr(client, "__exit__"):
+                # Pinecone's Index closes its connection pool only as a context manager
+                client.__exit__(None, None, None)
+
 
-# Embedding model - BGE base (768-dim, top MTEB performance)
-embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+def warm_up(*names: str):
+    """Build the named clients (default: everything the API server uses) now."""
+    for name in names or SERVER_CLIENTS:
+        client = _get(name)
+        if name == "embedding_model":
+            # First encode pays one-off setup costs (allocations, kernel selection)
+            client.encode("warmup")
+        elif name == "reranker":
+            client.model.predict([("warmup", "warmup")], show_progress_bar=False)
@@ -0,0 +1,107 @@
+"""
+Persistent cache for generated contextual commentary.
+Backed by a local SQLite file (WAL mode) so every worker process on the host
+shares it. Entries are keyed by normalized query plus (chapter, verse), expire
+after a freshness window and are evicted least-recently-used past a size cap.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from cache import normalize_query
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commentary (
+    key TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    chapter INTEGER NOT NULL,
+    verse TEXT NOT NULL,
+    commentary TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS commentary_last_used ON commentary (last_used);
+"""
+
+# Run eviction on roughly every Nth write rather than on each one
+EVICT_EVERY = 50
+
+
+class CommentaryCache:
+    """SQLite-backed commentary cache shared by all workers on a host."""
+
+    def __init__(self, path: str, max_entries: int, max_age_seconds: float, version: str = ""):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age_seconds
+        self.version = version  # bump to invalidate entries (e.g. prompt changes)
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections are not thread-safe
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def key(self, query: str, chapter, verse) -> str:
+        raw = f"{self.version}|{normalize_query(query)}|{chapter}:{verse}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, query: str, chapter, verse) -> str | None:
+        """Return fresh cached commentary, or None."""
+        key = self.key(query, chapter, verse)
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT commentary FROM commentary WHERE key = ? AND created_at >= ?",
+            (key, now - self.max_age if self.max_age else 0),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        conn.execute("UPDATE commentary SET last_used = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return row[0]
+
+    def put(self, query: str, chapter, verse, commentary: str):
+        """Store commentary, occasionally evicting stale and excess entries."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO commentary VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.key(query, chapter, verse), query, int(chapter), str(verse), commentary, now, now),
+        )
+        self._writes += 1
+        if self._writes % EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones beyond max_entries."""
+        conn = self._conn()
+        if self.max_age:
+            conn.execute("DELETE FROM commentary WHERE created_at < ?", (time.time() - self.max_age,))
+        conn.execute(
+            "DELETE FROM commentary WHERE key IN ("
+            "SELECT key FROM commentary ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
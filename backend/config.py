@@ -13,8 +13,11 @@ os.environ["TOKENIZERS_PARALLELISM"] = "false"
 os.environ["OMP_NUM_THREADS"] = "1"
 os.environ["MKL_NUM_THREADS"] = "1"
 
-import torch
-torch.set_num_threads(1)
+# Embedding backend: "torch" (SentenceTransformer) or "onnx" (ONNX Runtime, no torch).
+# torch itself is only imported when the model is loaded (see embedding_backends.py).
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+if EMBEDDING_BACKEND not in ("torch", "onnx"):
+    raise ValueError("EMBEDDING_BACKEND must be 'torch' or 'onnx'")
 
 # API Keys (validated at startup)
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
@@ -31,6 +34,92 @@ if not GPT_KEY:
 # Model configuration
 EMBEDDING_MODEL_NAME = "BAAI/bge-base-en-v1.5"
 EMBEDDING_DIMENSION = 768
+# BGE instruction prefix for indexed documents (queries get their own, see model.py)
+DOCUMENT_INSTRUCTION = "Represent this document for retrieval: "
+
+# ONNX backend: model repo id or local export dir (see export_onnx.py), and
+# the graph inside it - e.g. "onnx/model_qint8.onnx" for the int8 export
+EMBEDDING_MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH", EMBEDDING_MODEL_NAME)
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model.onnx")
+
+# Vector search backend: "local" serves queries from an in-process snapshot
+# of the index, "pinecone" queries the hosted index on every request
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "local")
+if VECTOR_BACKEND not in ("local", "pinecone"):
+    raise ValueError("VECTOR_BACKEND must be 'local' or 'pinecone'")
+
+# Pinecone access (VECTOR_BACKEND=pinecone, and scripts).
+# PINECONE_HOST skips the control-plane lookup - e.g. a local stand-in server.
+# Each attempt gets PINECONE_TIMEOUT_MS, the whole call (retries with
+# jittered backoff included) PINECONE_DEADLINE_MS. PINECONE_HEDGE_MS > 0
+# sends a second request when the first is that slow. After
+# PINECONE_BREAKER_FAILURES failed calls in a row, queries go to the local
+# corpus index for PINECONE_BREAKER_RESET_SECONDS.
+PINECONE_HOST = os.getenv("PINECONE_HOST", "")
+PINECONE_POOL_SIZE = int(os.getenv("PINECONE_POOL_SIZE", "32"))
+PINECONE_TIMEOUT_MS = float(os.getenv("PINECONE_TIMEOUT_MS", "800"))
+PINECONE_DEADLINE_MS = float(os.getenv("PINECONE_DEADLINE_MS", "2000"))
+PINECONE_RETRIES = int(os.getenv("PINECONE_RETRIES", "2"))
+PINECONE_RETRY_BACKOFF_MS = float(os.getenv("PINECONE_RETRY_BACKOFF_MS", "50"))
+PINECONE_HEDGE_MS = float(os.getenv("PINECONE_HEDGE_MS", "0"))
+PINECONE_BREAKER_FAILURES = int(os.getenv("PINECONE_BREAKER_FAILURES", "5"))
+PINECONE_BREAKER_RESET_SECONDS = float(os.getenv("PINECONE_BREAKER_RESET_SECONDS", "30"))
+
+# Request pipeline concurrency (per worker process).
+# Encoding is CPU-bound and runs on its own small thread pool; blocking
+# vector-store calls get a larger pool; LLM calls use the async client.
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "8"))
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "32"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "64"))
+
+# Hybrid retrieval: the BM25 top-k (over translation, summary and commentary)
+# is fused with the dense top-k by reciprocal rank fusion. 0 = dense only.
+LEXICAL_TOP_K = int(os.getenv("LEXICAL_TOP_K", "8"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Optional cross-encoder re-ranking of the top-N fused candidates (0 = off).
+# Requests whose re-ranking would run past the budget keep the fused order.
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "0"))
+RERANKER_MODEL_NAME = os.getenv("RERANKER_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "8"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "20000"))
+
+# Query embedding micro-batching: concurrent queries arriving within the
+# window (or until the batch is full) share one forward pass
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "5"))
+
+# Query embedding cache (keyed on normalized query text).
+# TTL of 0 disables expiry; an empty path disables persistence across restarts.
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "5000"))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "0"))
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH", "cache/query_embeddings.npz")
+
+# Contextual commentary cache (SQLite, shared by all workers on the host).
+# An empty path disables it; max age of 0 keeps entries until evicted.
+COMMENTARY_CACHE_PATH = os.getenv("COMMENTARY_CACHE_PATH", "cache/commentary.sqlite3")
+COMMENTARY_CACHE_MAX_ENTRIES = int(os.getenv("COMMENTARY_CACHE_MAX_ENTRIES", "50000"))
+COMMENTARY_CACHE_MAX_AGE_SECONDS = float(
+    os.getenv("COMMENTARY_CACHE_MAX_AGE_SECONDS", str(30 * 24 * 3600))
+)
+
+# Corpus embedding cache (SQLite), keyed by document text and model, so
+# re-embedding the corpus only encodes texts that changed. Empty disables it.
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "cache/corpus_embeddings.sqlite3")
+
+# Semantic answer cache: reuse a full answer for paraphrased queries whose
+# embedding is within the cosine threshold and that hit the same top verse.
+# A size of 0 disables it. Entries expire after COMMENTARY_CACHE_MAX_AGE_SECONDS.
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "2000"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+
+# Per-client API rate limits (slowapi); turned off for local load tests
+RATE_LIMITS_ENABLED = os.getenv("RATE_LIMITS_ENABLED", "true").lower() != "false"
+
+# Cache-Control max-age for corpus-derived read endpoints (/api/all-verses, /api/verse)
+RESPONSE_CACHE_MAX_AGE = int(os.getenv("RESPONSE_CACHE_MAX_AGE", "3600"))
 
 # Processing constants
 MAX_WORKERS = 10
@@ -39,3 +128,6 @@ BATCH_SIZE = 100
 # Paths
 EMBEDDINGS_FOLDER = "embeddings"
 DATA_DIR = "data"
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshot")
+# Snapshots older than this are treated as stale and refetched from Pinecone (0 = never)
+SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("SNAPSHOT_MAX_AGE_SECONDS", "0"))
@@ -0,0 +1,63 @@
+"""
+One-time conversion of embeddings/verses.pkl + embeddings.pkl to the
+memory-mapped corpus format (see verse_table.py).
+
+    python convert_pickles.py
+    python convert_pickles.py --dtype float16 --remove-pickles
+
+Only run this on pickles you produced yourself: unpickling executes code.
+"""
+
+import argparse
+import os
+import pickle
+
+import numpy as np
+
+from config import EMBEDDINGS_FOLDER
+from embedding_matrix import write_embedding_matrix
+from verse_table import load_corpus, write_verses
+
+PICKLES = ("verses.pkl", "embeddings.pkl")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--folder", default=EMBEDDINGS_FOLDER)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--remove-pickles", action="store_true", help="delete the pickles once converted and verified")
+    args = parser.parse_args()
+
+    verses_path, embeddings_path = (os.path.join(args.folder, name) for name in PICKLES)
+    with open(verses_path, "rb") as f:
+        verses = pickle.load(f)
+    with open(embeddings_path, "rb") as f:
+        embeddings = np.asarray(pickle.load(f), dtype=np.float32)
+    if len(verses) != len(embeddings):
+        raise SystemExit(f"{len(verses)} verses but {len(embeddings)} embeddings")
+
+    write_verses(args.folder, verses)
+    ids = [f"ch{v['chapter']}_v{v['verse']}" for v in verses]
+    # The pickled embeddings predate the manifest, so their text and model are unknown
+    write_embedding_matrix(args.folder, ids, embeddings, args.dtype, source="pickle", model=None, instruction=None)
+
+    # Round-trip check before anything is deleted
+    table, matrix = load_corpus(args.folder)
+    for original, loaded in zip(verses, table):
+        for name in ("chapter", "translation", "commentary"):
+            if original[name] != loaded[name]:
+                raise SystemExit(f"Mismatch in {name} of ch{original['chapter']}_v{original['verse']}")
+    tolerance = 1e-3 if args.dtype == "float16" else 0
+    if not np.allclose(matrix, embeddings, atol=tolerance, rtol=0):
+        raise SystemExit("Embedding matrix does not match the pickle")
+    print(f"Converted {len(table)} verses and {matrix.shape[0]}x{matrix.shape[1]} {args.dtype} embeddings "
+          f"in '{args.folder}'")
+
+    if args.remove_pickles:
+        for path in (verses_path, embeddings_path):
+            os.remove(path)
+        print("Removed the pickles")
+
+
+if __name__ == "__main__":
+    main()
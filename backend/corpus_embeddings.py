@@ -0,0 +1,164 @@
+"""
+Corpus (document) embeddings for GitaChat.
+One definition of the text that gets embedded for a verse, and one pipeline
+that embeds many of them: texts are encoded in large batches sorted by
+length (little padding), optionally spread over a process pool, and every
+embedding is cached by content hash and model, so unchanged texts are never
+encoded twice.
+"""
+
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from config import (
+    DOCUMENT_INSTRUCTION,
+    EMBEDDING_BACKEND,
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_MODEL_PATH,
+    EMBEDDING_ONNX_FILE,
+)
+from snapshot import content_hash
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key TEXT PRIMARY KEY,
+    vector BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+# SQLite's default limit on bound parameters is 999
+LOOKUP_CHUNK = 500
+
+
+def document_text(verse: dict) -> str:
+    """
+    The text embedded for a verse: instruction prefix, translation, then the
+    summary - or the commentary where no summary exists yet.
+    """
+    return f"{DOCUMENT_INSTRUCTION}{verse['translation']} {verse.get('summary') or verse.get('commentary', '')}"
+
+
+def model_key(backend: str = EMBEDDING_BACKEND) -> str:
+    """Identifies the weights that produce an embedding (ONNX/int8 exports differ from torch)."""
+    if backend == "onnx":
+        return f"onnx:{EMBEDDING_MODEL_PATH}/{EMBEDDING_ONNX_FILE}"
+    return f"torch:{EMBEDDING_MODEL_NAME}"
+
+
+class EmbeddingCache:
+    """SQLite store of float32 embeddings keyed by hash(model, text)."""
+
+    def __init__(self, path: str, model: str):
+        self.path = path
+        self.model = model
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def key(self, text: str) -> str:
+        return content_hash(self.model, text)
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found = {}
+        for start in range(0, len(keys), LOOKUP_CHUNK):
+            chunk = keys[start : start + LOOKUP_CHUNK]
+            rows = self.conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items: dict[str, np.ndarray]):
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                [(key, np.asarray(v, dtype=np.float32).tobytes(), now) for key, v in items.items()],
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+# Per-process model for pool workers (each loads its own copy)
+_worker_model = None
+
+
+def _init_worker():
+    global _worker_model
+    from embedding_backends import load_embedding_model
+
+    _worker_model = load_embedding_model(EMBEDDING_BACKEND)
+
+
+def _encode_in_worker(texts: list[str]) -> np.ndarray:
+    return np.asarray(_worker_model.encode(texts, batch_size=len(texts), normalize_embeddings=True), dtype=np.float32)
+
+
+def embed_documents(texts: list[str], batch_size: int = 64, workers: int = 1,
+                    cache: EmbeddingCache | None = None, progress=None) -> np.ndarray:
+    """
+    Embed texts (rows of the result are in input order). Cached embeddings are
+    reused; the rest are encoded longest-first in batches of batch_size, by
+    the shared model or, with workers > 1, by a pool of processes.
+    progress(done, total) is called after each batch.
+    """
+    keys = [cache.key(t) for t in texts] if cache else []
+    cached = cache.get_many(list(set(keys))) if cache else {}
+
+    # Unique texts that still need encoding, longest first
+    pending: dict[str, list[int]] = {}
+    for i, text in enumerate(texts):
+        if not cache or keys[i] not in cached:
+            pending.setdefault(text, []).append(i)
+    order = sorted(pending, key=len, reverse=True)
+    batches = [order[start : start + batch_size] for start in range(0, len(order), batch_size)]
+    logging.info(f"{len(texts) - sum(map(len, pending.values()))} cached, {len(order)} texts to encode")
+
+    result: np.ndarray | None = None
+    if cached:
+        dimension = len(next(iter(cached.values())))
+        result = np.empty((len(texts), dimension), dtype=np.float32)
+        for i, key in enumerate(keys):
+            if key in cached:
+                result[i] = cached[key]
+
+    def collect(batch: list[str], embeddings: np.ndarray):
+        nonlocal result
+        if result is None:
+            result = np.empty((len(texts), embeddings.shape[1]), dtype=np.float32)
+        for text, embedding in zip(batch, embeddings):
+            result[pending[text]] = embedding
+        if cache:
+            # Cached per batch, so an interrupted run keeps what it already paid for
+            cache.put_many({cache.key(text): embedding for text, embedding in zip(batch, embeddings)})
+
+    done = 0
+    if workers > 1 and len(batches) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            for batch, embeddings in zip(batches, pool.map(_encode_in_worker, batches)):
+                collect(batch, embeddings)
+                done += len(batch)
+                if progress:
+                    progress(done, len(order))
+    else:
+        import clients
+
+        for batch in batches:
+            embeddings = clients.embedding_model.encode(batch, batch_size=len(batch), normalize_embeddings=True)
+            collect(batch, np.asarray(embeddings, dtype=np.float32))
+            done += len(batch)
+            if progress:
+                progress(done, len(order))
+
+    if result is None:
+        return np.zeros((0, 0), dtype=np.float32)
+    return result
@@ -0,0 +1,76 @@
+"""
+Re-embed the verse corpus into a memory-mappable matrix.
+
+Every verse's document text (corpus_embeddings.document_text) is embedded in
+large length-sorted batches, optionally across a process pool, with
+embeddings cached by content hash and model: re-running after a small data
+fix only encodes the verses whose text changed. The result is written as
+<output>/embeddings.npy (rows aligned with the ids in embeddings.json), which
+np.load(..., mmap_mode="r") opens without reading it. With --source json the
+verse file is (re)written too, so the folder is a complete corpus
+(see verse_table.py).
+
+    python embed_corpus.py                          # verses from the embeddings folder
+    python embed_corpus.py --source json --workers 4
+    python embed_corpus.py --dtype float16 --output embeddings
+"""
+
+import argparse
+import time
+
+from tqdm import tqdm
+
+from config import DATA_DIR, DOCUMENT_INSTRUCTION, EMBEDDING_CACHE_PATH, EMBEDDINGS_FOLDER
+from corpus_embeddings import EmbeddingCache, document_text, embed_documents, model_key
+from embedding_matrix import write_embedding_matrix
+from snapshot import content_hash
+from utils import load_verses_from_json
+from verse_table import load_verses, write_verses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=["corpus", "json"], default="corpus")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--output", default=EMBEDDINGS_FOLDER)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=1, help="encoding processes (each loads the model)")
+    parser.add_argument("--no-cache", action="store_true", help="encode everything, ignoring the embedding cache")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.source == "corpus":
+        verses = load_verses(args.output)
+    else:
+        verses = load_verses_from_json(args.data_dir)
+        write_verses(args.output, verses)
+    print(f"Loaded {len(verses)} verses")
+
+    cache = None
+    if EMBEDDING_CACHE_PATH and not args.no_cache:
+        cache = EmbeddingCache(EMBEDDING_CACHE_PATH, model_key())
+
+    texts = [document_text(v) for v in verses]
+    with tqdm(desc="Embedding", unit="text") as bar:
+        def progress(done: int, total: int):
+            bar.total = total
+            bar.update(done - bar.n)
+
+        embeddings = embed_documents(texts, args.batch_size, args.workers, cache, progress)
+    if cache:
+        cache.close()
+
+    ids = [f"ch{v['chapter']}_v{v['verse']}" for v in verses]
+    manifest = write_embedding_matrix(
+        args.output, ids, embeddings, args.dtype,
+        model=model_key(), instruction=DOCUMENT_INSTRUCTION, source=args.source,
+        # Lets build_snapshot.py tell which rows still match the verse text
+        text_hashes=[content_hash(text) for text in texts],
+    )
+    print(f"\nDone! Wrote {manifest['count']}x{manifest['dimension']} {args.dtype} embeddings "
+          f"to '{args.output}' in {time.perf_counter() - started:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
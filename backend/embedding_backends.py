@@ -0,0 +1,99 @@
+"""
+Pluggable embedding backends for GitaChat.
+"torch" runs the full SentenceTransformer; "onnx" runs an exported ONNX graph
+of the same model (optionally int8-quantized) on ONNX Runtime, without
+loading PyTorch. Both expose a SentenceTransformer-style encode().
+"""
+
+import os
+
+import numpy as np
+
+from config import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_MODEL_PATH,
+    EMBEDDING_ONNX_FILE,
+)
+
+# Files the ONNX backend needs from a model repo or export directory
+TOKENIZER_FILE = "tokenizer.json"
+MAX_SEQ_LENGTH = 512
+
+
+def resolve_model_dir(model_path: str, files: list[str]) -> str:
+    """Local directory holding the given model files, downloading them if needed."""
+    if os.path.isdir(model_path):
+        return model_path
+    from huggingface_hub import snapshot_download
+
+    return snapshot_download(model_path, allow_patterns=files)
+
+
+class OnnxEmbeddingModel:
+    """BGE embeddings on ONNX Runtime (CLS pooling + L2 normalization)."""
+
+    def __init__(self, model_path: str, onnx_file: str, num_threads: int = 1):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = resolve_model_dir(model_path, [onnx_file, TOKENIZER_FILE])
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        # Same single-thread budget as torch (see config.py)
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, onnx_file), options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, texts: list[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        feeds = {name: value for name, value in feeds.items() if name in self._input_names}
+        last_hidden_state = self.session.run(None, feeds)[0]
+        return last_hidden_state[:, 0]  # CLS pooling, as configured for BGE
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = True, **kwargs):
+        """Embed one text (-> 1-D array) or a list of texts (-> 2-D array)."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        # Batch similar lengths together to minimize padding, then restore order
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        batches = [
+            self._encode_batch([texts[i] for i in order[start : start + batch_size]])
+            for start in range(0, len(texts), batch_size)
+        ]
+        embeddings = np.empty((len(texts), batches[0].shape[1]), dtype=np.float32)
+        embeddings[order] = np.concatenate(batches)
+
+        # BGE's SentenceTransformer pipeline ends with a Normalize module
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+        return embeddings[0] if single else embeddings
+
+
+def load_embedding_model(backend: str = EMBEDDING_BACKEND):
+    """Build the embedding model for the configured backend."""
+    if backend == "onnx":
+        return OnnxEmbeddingModel(EMBEDDING_MODEL_PATH, EMBEDDING_ONNX_FILE)
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    # Limit CPU threads to prevent contention on shared infrastructure
+    torch.set_num_threads(1)
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
@@ -0,0 +1,50 @@
+"""
+Memory-mapped embedding matrix files: <folder>/embeddings.npy (rows aligned
+with the ids in embeddings.json). Only needs numpy, so offline scripts can
+open the matrix without importing the model or the service clients.
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+MATRIX_FILE = "embeddings.npy"
+MATRIX_MANIFEST_FILE = "embeddings.json"
+
+
+def write_embedding_matrix(folder: str, ids: list[str], embeddings: np.ndarray,
+                           dtype: str = "float32", **info) -> dict:
+    """
+    Write embeddings as a .npy matrix (rows aligned with ids) plus a JSON
+    manifest; np.load(..., mmap_mode="r") opens it without reading it.
+    info (model, instruction, source, ...) goes into the manifest.
+    """
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, MATRIX_FILE)
+    tmp_path = f"{path}.tmp"
+    matrix = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=embeddings.shape)
+    matrix[:] = embeddings
+    matrix.flush()
+    del matrix
+    os.replace(tmp_path, path)
+
+    manifest = {
+        **info,
+        "dtype": dtype,
+        "count": int(embeddings.shape[0]),
+        "dimension": int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+        "created_at": time.time(),
+        "ids": ids,
+    }
+    with open(os.path.join(folder, MATRIX_MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_embedding_matrix(folder: str) -> tuple[np.ndarray, dict]:
+    """Memory-mapped matrix and its manifest, as written by write_embedding_matrix."""
+    with open(os.path.join(folder, MATRIX_MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    return np.load(os.path.join(folder, MATRIX_FILE), mmap_mode="r"), manifest
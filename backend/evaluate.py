@@ -0,0 +1,180 @@
+"""
+Offline retrieval benchmark: quality and latency of model.match and its parts.
+Runs every query in a golden set (query -> expected verses) through each
+retriever against the local snapshot index and reports recall@1, recall@4,
+MRR@4 and per-query latency side by side, so a ranking change can be judged on
+both before it ships.
+
+    python evaluate.py
+    python evaluate.py --retrievers match dense --output eval.json
+    LEXICAL_TOP_K=0 python evaluate.py --retrievers match   # dense-only match
+
+Retrievers:
+    match     the full pipeline (dense + BM25 fusion, re-ranking if enabled)
+    hybrid    fused dense + BM25 candidates, no re-ranking
+    dense     embedding search only
+    lexical   BM25 only
+
+A result counts as relevant if it covers any expected verse (grouped records
+such as ch13_v8-12 cover every verse in the range). Every retriever is cut
+at the same depth, the 4 verses an answer shows (best + 3 related), so the
+columns compare like with like. Latency is measured with
+the query embedding cache cleared, so each query pays for its encode.
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+# Quality numbers must not depend on Pinecone being reachable
+os.environ["VECTOR_BACKEND"] = "local"
+
+import model  # noqa: E402
+from verse_store import verse_numbers  # noqa: E402
+
+GOLDEN_FILE = "golden_queries.json"
+# Ranks counted for every retriever: match never returns more than this
+RANK_DEPTH = 4
+
+
+def parse_expected(labels: list[str]) -> set[tuple[int, int]]:
+    """["2:47", "3:19"] -> {(2, 47), (3, 19)}"""
+    return {tuple(int(part) for part in label.split(":")) for label in labels}
+
+
+def covers(meta: dict, vector_id: str = "") -> set[tuple[int, int]]:
+    """(chapter, verse) pairs a result covers, expanding grouped verses."""
+    return {(int(meta["chapter"]), n) for n in verse_numbers(vector_id, meta)}
+
+
+def hydrate(results: dict) -> list[set[tuple[int, int]]]:
+    ranked = []
+    for match in results["matches"]:
+        meta = model.verse_store.get_by_id(match["id"])
+        if meta is not None:
+            ranked.append(covers(meta, match["id"]))
+    return ranked
+
+
+def retrieve_match(query: str):
+    result = model.match(query)
+    if result is None:
+        return []
+    return [covers(r) for r in [result] + result["related"]]
+
+
+def retrieve_hybrid(query: str):
+    candidates = model.candidate_matches(query, model.search(model.embed_query(query)))
+    return [covers(c, c["id"]) for c in candidates]
+
+
+def retrieve_dense(query: str):
+    return hydrate(model.search(model.embed_query(query)))
+
+
+def retrieve_lexical(query: str):
+    if model.lexical_index is None:
+        raise SystemExit("lexical retriever needs LEXICAL_TOP_K > 0")
+    return hydrate(model.lexical_index.query(query, RANK_DEPTH))
+
+
+RETRIEVERS = {
+    "match": retrieve_match,
+    "hybrid": retrieve_hybrid,
+    "dense": retrieve_dense,
+    "lexical": retrieve_lexical,
+}
+
+
+def first_relevant_rank(ranked: list[set], expected: set) -> int | None:
+    """1-based rank of the first result covering an expected verse."""
+    for rank, covered in enumerate(ranked[:RANK_DEPTH], start=1):
+        if covered & expected:
+            return rank
+    return None
+
+
+def evaluate(name: str, golden: list[dict], repeats: int) -> dict:
+    retrieve = RETRIEVERS[name]
+    per_query = []
+    for item in golden:
+        expected = parse_expected(item["expected"])
+        timings = []
+        for _ in range(repeats):
+            model.query_embedding_cache.clear()
+            started = time.perf_counter()
+            ranked = retrieve(item["query"])
+            timings.append((time.perf_counter() - started) * 1000)
+        rank = first_relevant_rank(ranked, expected)
+        per_query.append(
+            {
+                "query": item["query"],
+                "expected": item["expected"],
+                "rank": rank,
+                "top": [sorted(covered)[0] for covered in ranked[:RANK_DEPTH]],
+                "latency_ms": float(np.median(timings)),
+            }
+        )
+
+    ranks = [q["rank"] for q in per_query]
+    latencies = np.array([q["latency_ms"] for q in per_query])
+    return {
+        "retriever": name,
+        "queries": len(per_query),
+        "recall@1": sum(1 for r in ranks if r == 1) / len(ranks),
+        "recall@4": sum(1 for r in ranks if r and r <= 4) / len(ranks),
+        f"mrr@{RANK_DEPTH}": sum(1 / r for r in ranks if r) / len(ranks),
+        "latency_ms": {
+            "mean": float(latencies.mean()),
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+            "max": float(latencies.max()),
+        },
+        "per_query": per_query,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--golden", default=GOLDEN_FILE)
+    parser.add_argument("--retrievers", nargs="+", default=list(RETRIEVERS), choices=list(RETRIEVERS))
+    parser.add_argument("--repeats", type=int, default=3, help="timed runs per query (median is kept)")
+    parser.add_argument("--output", help="write the full report (with per-query results) as JSON")
+    parser.add_argument("--misses", action="store_true", help="list queries with no relevant result in the top 4")
+    args = parser.parse_args()
+
+    with open(args.golden) as f:
+        golden = json.load(f)
+
+    # One untimed pass so model and index warm-up is not charged to the first query
+    model.match("warmup")
+
+    reports = [evaluate(name, golden, args.repeats) for name in args.retrievers]
+
+    print(f"{len(golden)} queries, {len(model.verse_store)} verses, ranks counted to depth {RANK_DEPTH}\n")
+    print(f"{'retriever':<10} {'R@1':>6} {'R@4':>6} {f'MRR@{RANK_DEPTH}':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    for report in reports:
+        latency = report["latency_ms"]
+        print(
+            f"{report['retriever']:<10} {report['recall@1']:>6.3f} {report['recall@4']:>6.3f} "
+            f"{report[f'mrr@{RANK_DEPTH}']:>6.3f} {latency['p50']:>8.2f} {latency['p95']:>8.2f}"
+        )
+    if args.misses:
+        for report in reports:
+            misses = [q for q in report["per_query"] if not q["rank"]]
+            print(f"\n{report['retriever']} misses ({len(misses)}):")
+            for q in misses:
+                top = ", ".join(f"{c}:{v}" for c, v in q["top"])
+                print(f"  {q['query']!r}: expected {', '.join(q['expected'])}; got {top}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"golden": args.golden, "rank_depth": RANK_DEPTH, "reports": reports}, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
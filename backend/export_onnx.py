@@ -0,0 +1,72 @@
+"""
+Export the BGE embedding model to ONNX, plus a dynamically int8-quantized copy.
+Output is a self-contained directory usable with EMBEDDING_BACKEND=onnx:
+
+    python export_onnx.py models/bge-base-en-v1.5-onnx
+    EMBEDDING_MODEL_PATH=models/bge-base-en-v1.5-onnx EMBEDDING_ONNX_FILE=onnx/model_qint8.onnx
+
+Needs torch and transformers (dev machines only; serving needs onnxruntime).
+"""
+
+import argparse
+import os
+
+from config import EMBEDDING_MODEL_NAME
+
+INPUT_NAMES = ["input_ids", "attention_mask", "token_type_ids"]
+
+
+def export(output_dir: str) -> str:
+    """Export the fp32 graph and tokenizer; returns the ONNX file path."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL_NAME)
+    model = AutoModel.from_pretrained(EMBEDDING_MODEL_NAME).eval()
+    tokenizer.save_pretrained(output_dir)  # writes tokenizer.json
+
+    onnx_path = os.path.join(output_dir, "onnx", "model.onnx")
+    os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+    sample = tokenizer(["Represent this sentence for searching relevant passages: warmup"], return_tensors="pt")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in INPUT_NAMES + ["last_hidden_state"]}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in INPUT_NAMES),
+            onnx_path,
+            input_names=INPUT_NAMES,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+        )
+    return onnx_path
+
+
+def quantize(onnx_path: str) -> str:
+    """Dynamic int8 weight quantization; returns the quantized file path."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = onnx_path.replace("model.onnx", "model_qint8.onnx")
+    quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("output_dir", nargs="?", default="models/bge-base-en-v1.5-onnx")
+    parser.add_argument("--no-quantize", action="store_true", help="Only export the fp32 graph")
+    args = parser.parse_args()
+
+    print(f"Exporting {EMBEDDING_MODEL_NAME} to ONNX...")
+    onnx_path = export(args.output_dir)
+    print(f"  fp32: {onnx_path} ({os.path.getsize(onnx_path) / 1e6:.0f} MB)")
+
+    if not args.no_quantize:
+        quantized_path = quantize(onnx_path)
+        print(f"  int8: {quantized_path} ({os.path.getsize(quantized_path) / 1e6:.0f} MB)")
+
+    print("\nDone! Check parity with: python bench_embeddings.py")
+
+
+if __name__ == "__main__":
+    main()
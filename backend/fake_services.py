@@ -0,0 +1,291 @@
+"""
+Local stand-ins for Pinecone, OpenAI and the scraped verse site, for load
+tests and offline testing. One aiohttp server answers all of them, with
+configurable injected latency (fixed + exponential tail) and error rates per
+service:
+
+    POST /query                  Pinecone index query (filters, values, metadata)
+    POST /vectors/upsert         Pinecone upsert
+    POST /describe_index_stats   Pinecone index stats
+    POST /v1/chat/completions    OpenAI chat completions (streaming or not)
+    GET  /chapter/{c}/verse/{v}  verse page as scrape.py expects it (ETag, Last-Modified, 304s)
+    POST /language/translate/v2  Google Translate v2 (repeated q values), for translate.py
+    POST /_control               change latency/error settings at runtime
+    GET  /_stats                 request counts per service
+
+The corpus comes from a snapshot directory when given, otherwise it is
+synthetic (the real chapter/verse layout, random vectors and text).
+Point the backend at it with:
+
+    PINECONE_HOST=http://127.0.0.1:8100 OPENAI_BASE_URL=http://127.0.0.1:8100/v1
+    python scrape.py --base-url http://127.0.0.1:8100
+    python translate.py --endpoint http://127.0.0.1:8100/language/translate/v2
+
+    python fake_services.py --port 8100 --pinecone-latency-ms 40 --openai-latency-ms 300
+"""
+
+import argparse
+import asyncio
+import hashlib
+import html
+import json
+import os
+import random
+import time
+from collections import Counter
+from email.utils import formatdate
+
+import numpy as np
+from aiohttp import web
+
+from snapshot import MANIFEST_FILE, load_snapshot
+from vector_index import LocalIndex
+
+# Verses per chapter of the Gita
+CHAPTER_LENGTHS = (47, 72, 43, 42, 29, 47, 30, 28, 34, 42, 55, 20, 35, 27, 20, 24, 28, 78)
+
+WORDS = (
+    "action duty mind peace self soul knowledge devotion yoga desire attachment "
+    "wisdom senses lord krishna arjuna battle fear anger death truth nature "
+    "discipline sacrifice faith surrender meditation work fruit equanimity"
+).split()
+
+COMMENTARY = (
+    "This verse speaks directly to your question. Krishna teaches that steady "
+    "action without attachment to results frees the mind from anxiety, and that "
+    "inner peace comes from doing one's duty with devotion rather than from "
+    "controlling outcomes. Reflect on where you can act fully today while "
+    "letting go of what is not yours to decide."
+)
+
+
+def synthetic_corpus(dimension: int, seed: int = 0):
+    """Random unit vectors and placeholder text in the real chapter/verse layout."""
+    rng = np.random.default_rng(seed)
+    ids, metadata = [], []
+    for chapter, length in enumerate(CHAPTER_LENGTHS, start=1):
+        for verse in range(1, length + 1):
+            ids.append(f"ch{chapter}_v{verse}")
+            text = lambda n: " ".join(rng.choice(WORDS, n))
+            metadata.append(
+                {
+                    "chapter": chapter,
+                    "verse": verse,
+                    "translation": text(25),
+                    "summary": text(60),
+                    "commentary": text(400),
+                }
+            )
+    return ids, rng.normal(size=(len(ids), dimension)).astype(np.float32), metadata
+
+
+def load_corpus(snapshot_dir: str | None, dimension: int) -> LocalIndex:
+    if snapshot_dir:
+        with open(os.path.join(snapshot_dir, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        snapshot = load_snapshot(snapshot_dir, manifest["model"], manifest["dimension"])
+        return LocalIndex(snapshot.ids, snapshot.embeddings, snapshot.metadata(), normalized=True)
+    return LocalIndex(*synthetic_corpus(dimension))
+
+SERVICES = ("pinecone", "openai", "site", "translate")
+
+
+def render_verse_page(metadata: dict) -> str:
+    """Minimal verse page with the markup scrape.py parses."""
+    return (
+        f"<html><head><title>Bhagavad Gita {metadata['chapter']}.{metadata['verse']}</title></head><body>"
+        f"<div class=\"bg-verse-translation\"><p>{html.escape(metadata['translation'])}</p></div>"
+        f"<div class=\"bg-verse-commentary\"><p>{html.escape(metadata['commentary'])}</p></div>"
+        "</body></html>"
+    )
+
+
+class Fault:
+    """Injected latency (fixed + exponential tail) and error rate for one service."""
+
+    def __init__(self, latency_ms: float = 0, tail_ms: float = 0, error_rate: float = 0):
+        self.latency_ms = latency_ms
+        self.tail_ms = tail_ms
+        self.error_rate = error_rate
+
+    def delay(self) -> float:
+        tail = random.expovariate(1 / self.tail_ms) if self.tail_ms else 0.0
+        return (self.latency_ms + tail) / 1000
+
+    def fails(self) -> bool:
+        return random.random() < self.error_rate
+
+
+def build_app(index: LocalIndex, faults: dict[str, Fault], token_ms: float) -> web.Application:
+    counts = Counter()
+
+    async def inject(service: str) -> web.Response | None:
+        counts[service] += 1
+        fault = faults[service]
+        await asyncio.sleep(fault.delay())
+        if fault.fails():
+            counts[f"{service}_errors"] += 1
+            return web.json_response({"error": {"message": "injected failure"}}, status=503)
+        return None
+
+    async def query(request: web.Request) -> web.Response:
+        body = await request.json()
+        error = await inject("pinecone")
+        if error:
+            return error
+        result = index.query(
+            body["vector"],
+            top_k=body.get("topK", 10),
+            include_metadata=body.get("includeMetadata", False),
+            include_values=body.get("includeValues", False),
+            filter=body.get("filter"),
+        )
+        return web.json_response({**result, "namespace": "", "usage": {"readUnits": 5}})
+
+    async def upsert(request: web.Request) -> web.Response:
+        body = await request.json()
+        error = await inject("pinecone")
+        if error:
+            return error
+        positions = {vector_id: i for i, vector_id in enumerate(index.ids)}
+        for vector in body["vectors"]:
+            i = positions.get(vector["id"])
+            if i is not None:
+                index.metadata[i] = vector.get("metadata", index.metadata[i])
+        return web.json_response({"upsertedCount": len(body["vectors"])})
+
+    async def describe_index_stats(request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "dimension": int(index.matrix.shape[1]),
+                "totalVectorCount": len(index),
+                "namespaces": {"": {"vectorCount": len(index)}},
+            }
+        )
+
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        error = await inject("openai")
+        if error:
+            return error
+        created = int(time.time())
+        if not body.get("stream"):
+            return web.json_response(
+                {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": body["model"],
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": COMMENTARY},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {"prompt_tokens": 200, "completion_tokens": 80, "total_tokens": 280},
+                }
+            )
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for token in COMMENTARY.split(" "):
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body["model"],
+                "choices": [{"index": 0, "delta": {"content": token + " "}, "finish_reason": None}],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await asyncio.sleep(token_ms / 1000)
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    # When each page body (by ETag) was first served, for Last-Modified
+    first_served: dict[str, float] = {}
+
+    async def verse_page(request: web.Request) -> web.Response:
+        error = await inject("site")
+        if error:
+            return error
+        key = (int(request.match_info["chapter"]), request.match_info["verse"])
+        positions = {(int(m["chapter"]), str(m["verse"])): i for i, m in enumerate(index.metadata)}
+        if key not in positions:
+            return web.Response(status=404, text="<html><body>Page not found</body></html>", content_type="text/html")
+
+        body = render_verse_page(index.metadata[positions[key]])
+        etag = f'"{hashlib.sha256(body.encode()).hexdigest()[:16]}"'
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(first_served.setdefault(etag, time.time()), usegmt=True),
+        }
+        if request.headers.get("If-None-Match") == etag:
+            counts["site_not_modified"] += 1
+            return web.Response(status=304, headers=headers)
+        return web.Response(text=body, content_type="text/html", headers=headers)
+
+    async def translate(request: web.Request) -> web.Response:
+        form = await request.post()
+        error = await inject("translate")
+        if error:
+            return error
+        texts = form.getall("q", [])
+        counts["translate_strings"] += len(texts)
+        # Deterministic English stand-in, free of Devanagari
+        translations = [
+            {"translatedText": f"English rendering {hashlib.sha256(text.encode()).hexdigest()[:8]}"}
+            for text in texts
+        ]
+        return web.json_response({"data": {"translations": translations}})
+
+    async def control(request: web.Request) -> web.Response:
+        """Body like {"pinecone": {"latency_ms": 500, "error_rate": 0.2}}."""
+        for service, settings in (await request.json()).items():
+            for name, value in settings.items():
+                setattr(faults[service], name, float(value))
+        return web.json_response({name: vars(fault) for name, fault in faults.items()})
+
+    async def stats(request: web.Request) -> web.Response:
+        return web.json_response(dict(counts))
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/query", query)
+    app.router.add_post("/vectors/upsert", upsert)
+    app.router.add_post("/describe_index_stats", describe_index_stats)
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_get("/chapter/{chapter}/verse/{verse}", verse_page)
+    app.router.add_post("/language/translate/v2", translate)
+    app.router.add_post("/_control", control)
+    app.router.add_get("/_stats", stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--snapshot", help="serve this snapshot's vectors (default: synthetic corpus)")
+    parser.add_argument("--dimension", type=int, default=768, help="synthetic corpus dimension")
+    for service in SERVICES:
+        parser.add_argument(f"--{service}-latency-ms", type=float, default=0)
+        parser.add_argument(f"--{service}-tail-ms", type=float, default=0, help="mean of an exponential extra delay")
+        parser.add_argument(f"--{service}-error-rate", type=float, default=0)
+    parser.add_argument("--openai-token-ms", type=float, default=0, help="delay between streamed tokens")
+    args = parser.parse_args()
+
+    faults = {
+        service: Fault(
+            getattr(args, f"{service}_latency_ms"),
+            getattr(args, f"{service}_tail_ms"),
+            getattr(args, f"{service}_error_rate"),
+        )
+        for service in SERVICES
+    }
+    app = build_app(load_corpus(args.snapshot, args.dimension), faults, args.openai_token_ms)
+    print(f"Fake Pinecone + OpenAI + verse site + Translate listening on http://{args.host}:{args.port}", flush=True)
+    web.run_app(app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,8 @@ from tqdm import tqdm
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from config import MAX_WORKERS, DATA_DIR
-from clients import openai_client, index, embedding_model
+from clients import openai_client, index
+from corpus_embeddings import document_text, embed_documents
 
 
 def load_all_verses():
@@ -102,10 +103,10 @@ def main():
     print("\nCreating embeddings with BGE model and uploading to Pinecone...")
     vectors = []
 
-    for item in tqdm(processed, desc="Embedding"):
-        text = f"{item['translation']} {item['summary']}"
-        embedding = embedding_model.encode(text)
+    # The model is loaded only now, after the GPT calls, and only if there is work to do
+    embeddings = embed_documents([document_text(item) for item in processed])
 
+    for item, embedding in zip(processed, embeddings):
         vectors.append(
             {
                 "id": f"ch{item['chapter']}_v{item['verse']}",
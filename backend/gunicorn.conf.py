@@ -0,0 +1,78 @@
+"""
+Gunicorn settings for multi-worker serving:
+
+    WEB_CONCURRENCY=4 gunicorn main:app -c gunicorn.conf.py  # default 2 workers
+
+The app is imported once in the master (preload_app), and main.preload()
+loads the corpus index, verse store, encoded payloads and embedding model
+there before any worker forks. Workers then share those pages copy-on-write
+instead of each loading its own copy. Network clients (Pinecone, OpenAI)
+are never inherited: each worker builds its own in the app lifespan. The
+snapshot matrix is memory-mapped, so it is shared through the page cache
+either way. Following the gc docs for fork servers, collection is off in
+the master and everything loaded is frozen before forking, so collections
+in workers do not write to (and un-share) the preloaded objects.
+"""
+
+import gc
+import glob
+import os
+import tempfile
+
+# The master's tokenizer warm-up would otherwise leave a Rust thread pool that
+# does not survive fork (tokenizers warns and disables it in every worker)
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+# The master only loads and forks: no garbage worth collecting, and no holes
+# punched into pages the workers will share
+gc.disable()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# Not one per CPU: only the model weights and the mapped corpus are shared, and
+# each worker still has its own torch/ONNX arenas, caches and thread pools.
+# On a large shared host that many workers could run it out of memory, so
+# scaling up is explicit.
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Model load happens before the workers start, so the default timeout is enough
+timeout = 60
+graceful_timeout = 30
+
+# Prometheus multiprocess mode: every worker writes its metrics to files in
+# this directory and /metrics aggregates them. It must be set before
+# prometheus_client is imported, i.e. before the app is preloaded.
+metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if metrics_dir:
+    os.makedirs(metrics_dir, exist_ok=True)
+    # Files from a previous run would be summed into this one's metrics
+    for stale in glob.glob(os.path.join(metrics_dir, "*.db")):
+        os.remove(stale)
+else:
+    metrics_dir = tempfile.mkdtemp(prefix="gitachat-metrics-")
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+
+
+def when_ready(server):
+    # Runs in the master after the app is imported and before workers are forked
+    import clients
+    import main
+
+    main.preload()
+    # Built if the corpus was fetched from Pinecone; workers open their own
+    clients.release(*clients.PER_PROCESS_CLIENTS)
+    gc.freeze()
+    server.log.info(
+        f"Preloaded app; {gc.get_freeze_count()} objects frozen "
+        "for copy-on-write sharing"
+    )
+
+
+def post_fork(server, worker):
+    gc.enable()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
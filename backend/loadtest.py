@@ -0,0 +1,374 @@
+"""
+End-to-end load test for the API server, without real Pinecone/OpenAI calls.
+Starts fake_services.py and `uvicorn main:app` pointed at it, then drives
+/api/query, /api/verse and /api/all-verses at each concurrency level and
+records throughput, latency percentiles and server RSS. Results go to a JSON
+file, so runs from different commits can be compared.
+
+    python loadtest.py --concurrency 1 8 32 --duration 15 --output loadtest.json
+    python loadtest.py --openai-latency-ms 800 --pinecone-error-rate 0.05 --vector-backend pinecone
+    python loadtest.py --workers 0 1 2 4 --concurrency 32   # uvicorn vs preloaded gunicorn workers
+
+--workers 0 is a single uvicorn process; N > 0 runs gunicorn.conf.py with N
+workers. Each server's idle memory is reported as RSS (counts shared pages
+in every process) and PSS (splits them between the processes sharing them),
+per process, so the copy-on-write saving shows up as PSS per worker.
+
+The embedding model is whatever the environment configures (EMBEDDING_BACKEND).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+import numpy as np
+
+from fake_services import CHAPTER_LENGTHS
+
+# As in config.py, which can't be imported without the real service keys
+COMMENTARY_CACHE_PATH = os.getenv("COMMENTARY_CACHE_PATH", "cache/commentary.sqlite3")
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH", "cache/query_embeddings.npz")
+
+QUERIES = [
+    "how to deal with anxiety",
+    "what is dharma",
+    "I feel anxious about work",
+    "how do I control my anger",
+    "what happens after death",
+    "should I act if I can't control the outcome",
+    "how to find inner peace",
+    "what is the nature of the soul",
+    "why do good people suffer",
+    "how to meditate",
+    "what is true devotion",
+    "how to let go of attachment",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def process_tree(pid: int) -> list[int]:
+    """A process and all its descendants (Linux /proc)."""
+    found, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending += [int(child) for child in f.read().split()]
+        except FileNotFoundError:
+            continue
+        found.append(current)
+    return found
+
+
+def _proc_kb(path: str, field: str) -> int:
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1])
+    except (FileNotFoundError, PermissionError):
+        pass
+    return 0
+
+
+def process_tree_rss_mb(pid: int) -> float:
+    """Resident memory of a process and all its descendants, in MB."""
+    return sum(_proc_kb(f"/proc/{p}/status", "VmRSS:") for p in process_tree(pid)) / 1024
+
+
+def memory_breakdown(pid: int) -> dict:
+    """RSS and PSS (shared pages split between sharers) per process and in total, in MB."""
+    processes = [
+        {
+            "pid": p,
+            "rss_mb": round(_proc_kb(f"/proc/{p}/status", "VmRSS:") / 1024, 1),
+            "pss_mb": round(_proc_kb(f"/proc/{p}/smaps_rollup", "Pss:") / 1024, 1),
+        }
+        for p in process_tree(pid)
+    ]
+    return {
+        "rss_mb": round(sum(p["rss_mb"] for p in processes), 1),
+        "pss_mb": round(sum(p["pss_mb"] for p in processes), 1),
+        "processes": processes,
+    }
+
+
+async def wait_until_up(url: str, timeout: float, process: subprocess.Popen):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {process.returncode}")
+            try:
+                async with session.get(url) as response:
+                    if response.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise TimeoutError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def make_request(endpoint: str, unique_queries: bool, counter: list[int]):
+    """(method, path, json body) for the next request to an endpoint."""
+    if endpoint == "query":
+        counter[0] += 1
+        query = random.choice(QUERIES)
+        if unique_queries:
+            # Defeats the query, commentary and semantic caches
+            query = f"{query} (variant {counter[0]})"
+        return "POST", "/api/query", {"query": query}
+    if endpoint == "verse":
+        chapter = random.randint(1, len(CHAPTER_LENGTHS))
+        verse = random.randint(1, CHAPTER_LENGTHS[chapter - 1])
+        return "POST", "/api/verse", {"chapter": chapter, "verse": verse}
+    return "GET", "/api/all-verses", None
+
+
+async def run_level(base_url: str, endpoint: str, concurrency: int, duration: float,
+                    server_pid: int, unique_queries: bool) -> dict:
+    """Closed-loop load: `concurrency` clients sending back-to-back for `duration` seconds."""
+    latencies_ms: list[float] = []
+    statuses: dict[str, int] = {}
+    rss_samples = [process_tree_rss_mb(server_pid)]
+    counter = [0]
+    stop_at = time.monotonic() + duration
+
+    async def client(session: aiohttp.ClientSession):
+        while time.monotonic() < stop_at:
+            method, path, body = make_request(endpoint, unique_queries, counter)
+            started = time.perf_counter()
+            try:
+                async with session.request(method, base_url + path, json=body) as response:
+                    await response.read()
+                    status = str(response.status)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = type(e).__name__
+            latencies_ms.append((time.perf_counter() - started) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    async def sample_rss():
+        while time.monotonic() < stop_at:
+            await asyncio.sleep(0.5)
+            rss_samples.append(process_tree_rss_mb(server_pid))
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=60)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        started = time.perf_counter()
+        sampler = asyncio.create_task(sample_rss())
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+
+    ok = sum(count for status, count in statuses.items() if status.startswith("2") or status == "304")
+    latencies = np.array(latencies_ms) if latencies_ms else np.zeros(1)
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "requests": len(latencies_ms),
+        "errors": len(latencies_ms) - ok,
+        "status_counts": statuses,
+        "throughput_rps": round(ok / elapsed, 2),
+        "latency_ms": {
+            "mean": round(float(latencies.mean()), 2),
+            "p50": round(float(np.percentile(latencies, 50)), 2),
+            "p95": round(float(np.percentile(latencies, 95)), 2),
+            "p99": round(float(np.percentile(latencies, 99)), 2),
+            "max": round(float(latencies.max()), 2),
+        },
+        "rss_mb": {"start": round(rss_samples[0], 1), "peak": round(max(rss_samples), 1)},
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def seed_caches(cache_dir: str) -> dict:
+    """
+    Copies of the configured commentary and query embedding caches, so a warm
+    run starts from them without writing the fake services' answers back.
+    """
+    paths = {
+        "COMMENTARY_CACHE_PATH": os.path.join(cache_dir, "commentary.sqlite3"),
+        "QUERY_CACHE_PATH": os.path.join(cache_dir, "query_embeddings.npz"),
+    }
+    if COMMENTARY_CACHE_PATH and os.path.exists(COMMENTARY_CACHE_PATH):
+        # Through the backup API: a live server may have part of it in the WAL
+        source, copy = sqlite3.connect(COMMENTARY_CACHE_PATH), sqlite3.connect(paths["COMMENTARY_CACHE_PATH"])
+        with copy:
+            source.backup(copy)
+        source.close()
+        copy.close()
+    if QUERY_CACHE_PATH and os.path.exists(QUERY_CACHE_PATH):
+        shutil.copyfile(QUERY_CACHE_PATH, paths["QUERY_CACHE_PATH"])
+    return paths
+
+
+def server_command(args, port: int, workers: int) -> list[str]:
+    if not workers:
+        return [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)]
+    return [
+        sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn.conf.py",
+        "--bind", f"127.0.0.1:{port}", "--workers", str(workers),
+    ]
+
+
+async def main(args):
+    fake_port, server_port = free_port(), free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    fake_cmd = [
+        sys.executable, "fake_services.py", "--port", str(fake_port),
+        "--pinecone-latency-ms", str(args.pinecone_latency_ms),
+        "--pinecone-tail-ms", str(args.pinecone_tail_ms),
+        "--pinecone-error-rate", str(args.pinecone_error_rate),
+        "--openai-latency-ms", str(args.openai_latency_ms),
+        "--openai-tail-ms", str(args.openai_tail_ms),
+        "--openai-error-rate", str(args.openai_error_rate),
+        "--openai-token-ms", str(args.openai_token_ms),
+    ]
+    has_snapshot = os.path.exists(os.path.join(args.snapshot, "manifest.json"))
+    if has_snapshot:
+        fake_cmd += ["--snapshot", args.snapshot]
+    # Without a snapshot, the server fetches the fake's synthetic corpus at startup
+    empty_dir = tempfile.TemporaryDirectory()
+    # The server's caches always live here: answers from the fake OpenAI must
+    # never reach the real commentary cache
+    cache_dir = tempfile.TemporaryDirectory()
+
+    server_env = {
+        **os.environ,
+        "PINECONE_API_KEY": os.environ.get("PINECONE_API_KEY", "loadtest"),
+        "PINECONE_INDEX": os.environ.get("PINECONE_INDEX", "loadtest"),
+        "PINECONE_HOST": fake_url,
+        "GPT_KEY": os.environ.get("GPT_KEY", "loadtest"),
+        "OPENAI_BASE_URL": f"{fake_url}/v1",
+        "VECTOR_BACKEND": args.vector_backend,
+        "RATE_LIMITS_ENABLED": "false",
+        "SNAPSHOT_DIR": args.snapshot if has_snapshot else empty_dir.name,
+    }
+    if args.cold_caches:
+        server_env.update(
+            COMMENTARY_CACHE_PATH=os.path.join(cache_dir.name, "commentary.sqlite3"),
+            QUERY_CACHE_PATH=os.path.join(cache_dir.name, "query_embeddings.npz"),
+            SEMANTIC_CACHE_SIZE="0",
+        )
+    else:
+        server_env.update(seed_caches(cache_dir.name))
+
+    fake = subprocess.Popen(fake_cmd)
+    servers, results = [], []
+    try:
+        await wait_until_up(f"{fake_url}/_stats", 30, fake)
+        for workers in args.workers:
+            server = None
+            try:
+                started = time.perf_counter()
+                server = subprocess.Popen(server_command(args, server_port, workers), env=server_env)
+                base_url = f"http://127.0.0.1:{server_port}"
+                await wait_until_up(f"{base_url}/health", args.startup_timeout, server)
+                startup_s = time.perf_counter() - started
+                if workers:
+                    # /health answers as soon as the first worker is up
+                    await asyncio.sleep(2)
+                memory = memory_breakdown(server.pid)
+                label = f"gunicorn, {workers} workers" if workers else "uvicorn"
+                per_process = ", ".join(f"{p['pss_mb']:.0f}" for p in memory["processes"])
+                servers.append({"workers": workers, "startup_s": round(startup_s, 2), "idle_memory": memory})
+                print(
+                    f"Server ({label}) up in {startup_s:.1f}s, "
+                    f"RSS {memory['rss_mb']:.0f} MB, PSS {memory['pss_mb']:.0f} MB "
+                    f"({per_process} MB per process)"
+                )
+
+                for endpoint in args.endpoints:
+                    for concurrency in args.concurrency:
+                        if args.warmup:
+                            await run_level(
+                                base_url, endpoint, concurrency, args.warmup, server.pid, args.unique_queries
+                            )
+                        result = await run_level(
+                            base_url, endpoint, concurrency, args.duration, server.pid, args.unique_queries
+                        )
+                        results.append({"workers": workers, **result})
+                        latency = result["latency_ms"]
+                        print(
+                            f"w={workers:<3} {endpoint:>10} c={concurrency:<4} "
+                            f"{result['throughput_rps']:>9.1f} req/s  "
+                            f"p50 {latency['p50']:>8.1f}  p95 {latency['p95']:>8.1f}  p99 {latency['p99']:>8.1f} ms  "
+                            f"errors {result['errors']:>5}  RSS {result['rss_mb']['peak']:.0f} MB"
+                        )
+            finally:
+                if server is not None:
+                    server.terminate()
+                    server.wait(timeout=30)
+    finally:
+        fake.terminate()
+        fake.wait(timeout=30)
+        empty_dir.cleanup()
+        cache_dir.cleanup()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "servers": servers,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", default=["query", "verse", "all-verses"],
+                        choices=["query", "verse", "all-verses"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--workers", nargs="+", type=int, default=[0],
+                        help="server configurations: 0 = one uvicorn process, N = gunicorn with N workers")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per endpoint and level")
+    parser.add_argument("--warmup", type=float, default=2, help="unmeasured seconds before each level")
+    parser.add_argument("--output", default="loadtest.json")
+    parser.add_argument("--snapshot", default=os.getenv("SNAPSHOT_DIR", "snapshot"),
+                        help="snapshot served by the fake Pinecone and loaded by the server "
+                             "(if missing, both use a synthetic corpus)")
+    parser.add_argument("--vector-backend", choices=["local", "pinecone"], default="local")
+    parser.add_argument("--unique-queries", action="store_true", help="make every /api/query text unique")
+    parser.add_argument("--cold-caches", action="store_true",
+                        help="start with empty commentary and query embedding caches and no semantic cache "
+                             "(by default they start as copies of the configured ones)")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--pinecone-latency-ms", type=float, default=30)
+    parser.add_argument("--pinecone-tail-ms", type=float, default=10)
+    parser.add_argument("--pinecone-error-rate", type=float, default=0)
+    parser.add_argument("--openai-latency-ms", type=float, default=400)
+    parser.add_argument("--openai-tail-ms", type=float, default=200)
+    parser.add_argument("--openai-error-rate", type=float, default=0)
+    parser.add_argument("--openai-token-ms", type=float, default=10)
+    asyncio.run(main(parser.parse_args()))
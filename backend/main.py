@@ -1,78 +1,98 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Path, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
+from typing import Annotated
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
+import asyncio
+import json
 import logging
+import os
 
-from config import EMBEDDING_DIMENSION
-from clients import index
+from config import RATE_LIMITS_ENABLED, RESPONSE_CACHE_MAX_AGE
+from metrics import MetricsMiddleware, RATE_LIMITED, record_fallback, render, route_of
+from response_cache import ResponseCache
 
 logging.basicConfig(level=logging.INFO)
 
-limiter = Limiter(key_func=get_remote_address)
+limiter = Limiter(key_func=get_remote_address, enabled=RATE_LIMITS_ENABLED)
 
 MAX_QUERY_LENGTH = 500
+MAX_BATCH_QUERIES = 256
 
-# Cache for all verses (loaded once on startup)
-all_verses_cache: list[dict] = []
+# Pre-encoded read responses (/api/all-verses, /api/verse)
+response_cache = ResponseCache(max_age=RESPONSE_CACHE_MAX_AGE)
 
 
-def load_all_verses_from_pinecone() -> list[dict]:
-    """Load all verses from Pinecone vector database"""
-    try:
-        verses = []
-        # Pinecone doesn't have a "fetch all" - we query with a dummy vector and high top_k
-        # Since we have ~700 verses, we fetch in batches by chapter
-        for chapter_num in range(1, 19):
-            logging.info(f"Fetching chapter {chapter_num} from Pinecone...")
-            results = index.query(
-                vector=[0] * EMBEDDING_DIMENSION,
-                top_k=100,  # Max verses per chapter is 78 (chapter 18)
-                include_metadata=True,
-                filter={"chapter": chapter_num},
-            )
-            logging.info(f"Chapter {chapter_num}: got {len(results['matches'])} verses")
-
-            for match in results["matches"]:
-                meta = match["metadata"]
-                verses.append(
-                    {
-                        "chapter": meta["chapter"],
-                        "verse": meta["verse"],
-                        "translation": meta["translation"],
-                        "summary": meta.get("summary", "")[:500],
-                    }
-                )
+_preloaded = False
 
-        # Sort by chapter and verse
-        verses.sort(key=lambda v: (v["chapter"], v["verse"]))
-        return verses
-    except Exception as e:
-        logging.error(f"Failed to load verses from Pinecone: {e}")
-        return []
+
+def preload():
+    """
+    Load the fork-safe state requests share: corpus index, verse store,
+    lexical index, encoded /api/all-verses payload and embedding model.
+    Under gunicorn this runs once in the master before workers fork (see
+    gunicorn.conf.py), so they share it copy-on-write; otherwise at startup.
+    Network clients are built per process, in lifespan.
+    """
+    global _preloaded
+    if _preloaded:
+        return
+    # Load the verse store on startup (local snapshot, or Pinecone as fallback)
+    logging.info("Loading verse store...")
+    from model import verse_store
+
+    logging.info(f"Loaded {len(verse_store)} verses")
+    # Encode the largest read payload before the first request needs it
+    all_verses_payload()
+
+    # Load the model on startup (before any requests)
+    logging.info("Loading embedding model...")
+    import clients
+
+    clients.warm_up(*clients.FORK_SAFE_CLIENTS)
+    logging.info("Model loaded and ready!")
+    _preloaded = True
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global all_verses_cache
-    # Load all verses from Pinecone on startup
-    logging.info("Loading all verses from Pinecone...")
-    all_verses_cache = load_all_verses_from_pinecone()
-    logging.info(f"Loaded {len(all_verses_cache)} verses")
+    preload()
+    # Per process: under gunicorn, after the fork
+    import clients
 
-    # Load model on startup (before any requests)
-    logging.info("Loading embedding model...")
-    from clients import embedding_model
+    clients.warm_up()
 
-    # Warm up the model with a dummy query
-    embedding_model.encode("warmup")
-    logging.info("Model loaded and ready!")
+    # Restore query embeddings cached by a previous run
+    from cache import load_embedding_cache, save_embedding_cache
+    from config import EMBEDDING_MODEL_NAME, QUERY_CACHE_PATH
+    from model import query_embedding_cache
+
+    if QUERY_CACHE_PATH and os.path.exists(QUERY_CACHE_PATH):
+        try:
+            loaded = load_embedding_cache(query_embedding_cache, QUERY_CACHE_PATH, EMBEDDING_MODEL_NAME)
+            logging.info(f"Restored {loaded} cached query embeddings")
+        except Exception as e:
+            logging.warning(f"Could not restore query embedding cache: {e}")
     yield
 
+    if QUERY_CACHE_PATH:
+        try:
+            save_embedding_cache(query_embedding_cache, QUERY_CACHE_PATH, EMBEDDING_MODEL_NAME)
+        except Exception as e:
+            logging.warning(f"Could not persist query embedding cache: {e}")
+
+    # Before the thread pools go: batches run on the embed stage
+    await clients.embedding_batcher.aclose()
+
+    import pipeline
+
+    pipeline.shutdown()
+
 
 app = FastAPI(lifespan=lifespan)
 app.state.limiter = limiter
@@ -88,13 +108,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "OPTIONS"],
     allow_headers=["Content-Type", "Authorization"],
+    expose_headers=["Server-Timing"],
 )
 
+# Outermost, so rate-limited and failed requests are measured too
+app.add_middleware(MetricsMiddleware)
+
 
 @app.exception_handler(RateLimitExceeded)
 async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
     from fastapi.responses import JSONResponse
 
+    RATE_LIMITED.labels(route_of(request.scope)).inc()
     return JSONResponse(status_code=429, content={"error": "Too many requests"})
 
 
@@ -102,6 +127,13 @@ class Query(BaseModel):
     query: str = Field(..., min_length=1, max_length=MAX_QUERY_LENGTH)
 
 
+class BatchQuery(BaseModel):
+    queries: list[Annotated[str, Field(min_length=1, max_length=MAX_QUERY_LENGTH)]] = Field(
+        ..., min_length=1, max_length=MAX_BATCH_QUERIES
+    )
+    include_commentary: bool = False
+
+
 class VerseRequest(BaseModel):
     chapter: int = Field(..., ge=1, le=18)
     verse: int = Field(..., ge=1, le=78)
@@ -112,6 +144,32 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics (stage latencies, cache hits, fallbacks, in-flight requests)."""
+    content, content_type = render()
+    return Response(content=content, media_type=content_type)
+
+
+@app.get("/stats")
+async def stats():
+    """Runtime stats for tuning (embedding micro-batcher, caches, re-ranker, Pinecone)."""
+    import clients
+    from clients import embedding_batcher
+    from config import RERANK_TOP_N, VECTOR_BACKEND
+    from model import query_embedding_cache, semantic_cache
+    from utils import commentary_cache
+
+    return {
+        "embedding_batcher": embedding_batcher.stats(),
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "commentary_cache": commentary_cache.stats() if commentary_cache else None,
+        "semantic_cache": semantic_cache.stats() if semantic_cache else None,
+        "reranker": clients.reranker.stats() if RERANK_TOP_N else None,
+        "vector_store": clients.search_index.stats() if VECTOR_BACKEND == "pinecone" else None,
+    }
+
+
 @app.post("/api/query", response_model=dict)
 @limiter.limit("30/minute")
 async def query_gita(request: Request, query: Query) -> dict:
@@ -120,20 +178,38 @@ async def query_gita(request: Request, query: Query) -> dict:
     Returns verse with contextual commentary tailored to the user's question.
     """
     try:
-        from model import match
-        from utils import generate_contextual_commentary
-
-        result = match(query.query)
+        from model import find_similar_answer, match_with_embedding_async, remember_answer
+        from utils import (
+            cache_commentary,
+            generate_contextual_commentary_async,
+            get_cached_commentary,
+        )
+
+        result, query_embedding = await match_with_embedding_async(query.query)
         if not result:
             raise HTTPException(status_code=404, detail="No matches found")
 
+        # Repeat questions reuse commentary generated earlier and skip OpenAI
+        cached = await get_cached_commentary(query.query, result)
+        if cached:
+            result["summarized_commentary"] = cached
+            return {"status": "success", "data": result}
+
+        # Paraphrases of earlier questions that land on the same verse reuse that answer
+        similar = find_similar_answer(query_embedding, result)
+        if similar:
+            return {"status": "success", "data": similar}
+
         # Generate contextual commentary that addresses the user's specific question
         try:
-            contextual = generate_contextual_commentary(query.query, result)
+            contextual = await generate_contextual_commentary_async(query.query, result)
             result["summarized_commentary"] = contextual
+            await cache_commentary(query.query, result, contextual)
+            remember_answer(query.query, query_embedding, result)
         except Exception as e:
             # Fall back to pre-computed summary if OpenAI fails
             logging.warning(f"Contextual commentary failed, using fallback: {e}")
+            record_fallback("commentary")
 
         return {"status": "success", "data": result}
     except HTTPException:
@@ -143,19 +219,170 @@ async def query_gita(request: Request, query: Query) -> dict:
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
-@app.post("/api/verse", response_model=dict)
+async def batch_commentary(query: str, result: dict):
+    """Contextual commentary for one batch result; cached, else generated."""
+    from utils import (
+        cache_commentary,
+        generate_contextual_commentary_async,
+        get_cached_commentary,
+    )
+
+    cached = await get_cached_commentary(query, result)
+    if cached:
+        result["summarized_commentary"] = cached
+        return
+    try:
+        contextual = await generate_contextual_commentary_async(query, result)
+        result["summarized_commentary"] = contextual
+        await cache_commentary(query, result, contextual)
+    except Exception as e:
+        logging.warning(f"Contextual commentary failed, using fallback: {e}")
+        record_fallback("commentary")
+
+
+@app.post("/api/query/batch", response_model=dict)
+@limiter.limit("10/minute")
+async def query_gita_batch(request: Request, batch: BatchQuery) -> dict:
+    """
+    Bulk variant of /api/query for offline jobs.
+    All queries are embedded in one batched forward pass and searched together.
+    Commentary is the pre-computed summary unless include_commentary is set.
+    Returns one result per query, in order (null where nothing matched).
+    """
+    try:
+        from model import match_many_async
+
+        results = await match_many_async(batch.queries)
+        if batch.include_commentary:
+            # Bounded by the LLM stage limit, like concurrent /api/query calls
+            await asyncio.gather(
+                *(
+                    batch_commentary(query, result)
+                    for query, result in zip(batch.queries, results)
+                    if result
+                )
+            )
+        return {"status": "success", "data": results}
+    except Exception as e:
+        logging.error(f"Batch query error: {type(e).__name__}: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+def ndjson_event(event_type: str, data=None) -> str:
+    """Encode one streaming event as a newline-delimited JSON line."""
+    event = {"type": event_type}
+    if data is not None:
+        event["data"] = data
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+
+@app.post("/api/query/stream")
+@limiter.limit("30/minute")
+async def query_gita_stream(request: Request, query: Query):
+    """
+    Streaming variant of /api/query (NDJSON).
+    Sends the matched verse as soon as search finishes, then the contextual
+    commentary token by token. Events, one JSON object per line:
+      {"type": "verse", "data": {...}}      matched verse + related verses
+      {"type": "token", "data": "..."}      commentary text delta
+      {"type": "fallback", "data": "..."}   stream failed; use this commentary instead
+      {"type": "done"}
+    """
+    try:
+        from model import match_with_embedding_async
+
+        result, query_embedding = await match_with_embedding_async(query.query)
+    except Exception as e:
+        logging.error(f"Query error: {type(e).__name__}: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+    if not result:
+        raise HTTPException(status_code=404, detail="No matches found")
+
+    async def event_stream():
+        from model import find_similar_answer, remember_answer
+        from utils import (
+            cache_commentary,
+            get_cached_commentary,
+            stream_contextual_commentary_async,
+        )
+
+        # Cached commentary goes out as a single token event
+        cached = await get_cached_commentary(query.query, result)
+        if cached:
+            yield ndjson_event("verse", result)
+            yield ndjson_event("token", cached)
+            yield ndjson_event("done")
+            return
+
+        similar = find_similar_answer(query_embedding, result)
+        if similar:
+            yield ndjson_event("verse", similar)
+            yield ndjson_event("token", similar["summarized_commentary"])
+            yield ndjson_event("done")
+            return
+
+        yield ndjson_event("verse", result)
+        try:
+            tokens = []
+            async for token in stream_contextual_commentary_async(query.query, result):
+                tokens.append(token)
+                yield ndjson_event("token", token)
+            contextual = "".join(tokens).strip()
+            await cache_commentary(query.query, result, contextual)
+            remember_answer(query.query, query_embedding, {**result, "summarized_commentary": contextual})
+        except Exception as e:
+            # Fall back to pre-computed summary if OpenAI fails mid-stream
+            logging.warning(f"Contextual commentary stream failed, using fallback: {e}")
+            record_fallback("commentary_stream")
+            yield ndjson_event("fallback", result["summarized_commentary"])
+        yield ndjson_event("done")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def verse_payload(chapter: int, verse: int):
+    """Encoded /api/verse response, built once per verse."""
+    from model import get_verse
+
+    result = get_verse(chapter, verse)
+    if not result:
+        raise HTTPException(status_code=404, detail="Verse not found")
+    return response_cache.get(
+        ("verse", chapter, verse), lambda: {"status": "success", "data": result}
+    )
+
+
+@app.post("/api/verse")
 @limiter.limit("30/minute")
-async def get_specific_verse(request: Request, verse_req: VerseRequest) -> dict:
+async def get_specific_verse(request: Request, verse_req: VerseRequest):
     """
     Get a specific verse by chapter and verse number.
     """
     try:
-        from model import get_verse
+        return verse_payload(verse_req.chapter, verse_req.verse).response(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error fetching verse: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
 
-        result = get_verse(verse_req.chapter, verse_req.verse)
-        if not result:
-            raise HTTPException(status_code=404, detail="Verse not found")
-        return {"status": "success", "data": result}
+
+@app.get("/api/verse/{chapter}/{verse}")
+@limiter.limit("30/minute")
+async def get_specific_verse_cacheable(
+    request: Request,
+    chapter: int = Path(..., ge=1, le=18),
+    verse: int = Path(..., ge=1, le=78),
+):
+    """
+    GET variant of /api/verse, cacheable by browsers and CDNs (ETag + Cache-Control).
+    """
+    try:
+        return verse_payload(chapter, verse).response(request)
     except HTTPException:
         raise
     except Exception as e:
@@ -163,11 +390,21 @@ async def get_specific_verse(request: Request, verse_req: VerseRequest) -> dict:
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+def all_verses_payload():
+    """Encoded /api/all-verses response, built once per process."""
+    from model import verse_store
+
+    return response_cache.get(
+        "all-verses", lambda: {"status": "success", "data": verse_store.summaries()}
+    )
+
+
 @app.get("/api/all-verses")
 @limiter.limit("10/minute")
 async def get_all_verses(request: Request):
     """
     Get all verses for client-side search.
     Returns chapter, verse, translation, and summary for all 703 verses.
+    Served pre-encoded (gzip/brotli) with an ETag; If-None-Match gets a 304.
     """
-    return {"status": "success", "data": all_verses_cache}
+    return all_verses_payload().response(request)
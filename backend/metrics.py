@@ -0,0 +1,136 @@
+"""
+Prometheus instrumentation for GitaChat.
+Per-stage latency histograms, cache/fallback/rate-limit counters and an
+in-flight gauge, exposed on /metrics. The same stage timings are collected
+per request and returned in a Server-Timing header, so the Next.js layer can
+see where a slow request spent its time. With several worker processes
+(gunicorn.conf.py sets PROMETHEUS_MULTIPROC_DIR), /metrics aggregates all
+of them.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Seconds; stages range from sub-millisecond lookups to multi-second LLM calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+STAGE_SECONDS = Histogram(
+    "gitachat_stage_seconds",
+    "Time spent in each request pipeline stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "gitachat_request_seconds",
+    "HTTP request latency until the response starts",
+    ["route", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+# Summed over live workers when several processes serve (multiprocess mode)
+IN_FLIGHT = Gauge(
+    "gitachat_requests_in_flight", "HTTP requests currently being handled", multiprocess_mode="livesum"
+)
+CACHE_REQUESTS = Counter(
+    "gitachat_cache_requests_total", "Cache lookups by cache and result", ["cache", "result"]
+)
+FALLBACKS = Counter(
+    "gitachat_fallbacks_total", "Degraded-path responses (e.g. pre-computed commentary)", ["reason"]
+)
+RATE_LIMITED = Counter(
+    "gitachat_rate_limited_total", "Requests rejected by the rate limiter", ["route"]
+)
+
+# Stage durations (ms) of the current request, for its Server-Timing header
+_request_timings: ContextVar[dict | None] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def timed(stage: str):
+    """Time a block into the stage histogram and the current request's timings."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed * 1000
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_fallback(reason: str):
+    FALLBACKS.labels(reason).inc()
+
+
+def route_of(scope) -> str:
+    """Route template (e.g. /api/verse/{chapter}/{verse}), never the raw path."""
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+def server_timing(timings: dict, total_ms: float) -> str:
+    entries = [f"{stage};dur={ms:.1f}" for stage, ms in timings.items()]
+    entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+
+def render() -> tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, and its content type."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        # Multi-worker serving: aggregate every worker's metric files, whichever worker is asked
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: in-flight gauge, request latency, and a Server-Timing
+    header with the stages that finished before the response started (for
+    streamed responses, that is everything up to the first byte).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings: dict[str, float] = {}
+        token = _request_timings.set(timings)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - started
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(timings, elapsed * 1000).encode()))
+                message = {**message, "headers": headers}
+                REQUEST_SECONDS.labels(route_of(scope), scope["method"], str(message["status"])).observe(elapsed)
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            IN_FLIGHT.dec()
+            _request_timings.reset(token)
@@ -1,26 +1,74 @@
 """
 Core model functionality for GitaChat.
-Handles verse matching and retrieval using Pinecone vector search.
+Handles verse matching and retrieval using vector search
+(in-process snapshot index or Pinecone, see config.VECTOR_BACKEND)
+fused with BM25 keyword search over the whole corpus, and optionally
+re-ranked by a cross-encoder (see config.RERANK_TOP_N).
 """
 
-from config import EMBEDDING_DIMENSION
-from clients import embedding_model, index
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 
-def get_verse(chapter: int, verse: int):
-    """Fetch a specific verse by chapter and verse number."""
-    # Query Pinecone for the specific verse using metadata filter
-    results = index.query(
-        vector=[0] * EMBEDDING_DIMENSION,  # Dummy vector, we're filtering by metadata
-        top_k=1,
-        include_metadata=True,
-        filter={"chapter": chapter, "verse": verse},
+from cache import LRUCache, normalize_query
+import clients
+from config import (
+    COMMENTARY_CACHE_MAX_AGE_SECONDS,
+    EMBEDDING_DIMENSION,
+    LEXICAL_TOP_K,
+    MAX_WORKERS,
+    QUERY_CACHE_SIZE,
+    QUERY_CACHE_TTL_SECONDS,
+    RERANK_BUDGET_MS,
+    RERANK_TOP_N,
+    RRF_K,
+    SEMANTIC_CACHE_SIZE,
+    SEMANTIC_CACHE_THRESHOLD,
+)
+from lexical_index import BM25Index
+from metrics import record_cache, record_fallback, timed
+from pipeline import run_in_stage
+from semantic_cache import SemanticCache
+from vector_index import LocalIndex
+from verse_store import VerseStore
+
+
+# Verse metadata, loaded once from the in-memory corpus
+verse_store = VerseStore(clients.corpus_index.ids, clients.corpus_index.metadata)
+
+# BM25 over translation, summary and commentary, for hybrid retrieval
+lexical_index = (
+    BM25Index(clients.corpus_index.ids, clients.corpus_index.metadata) if LEXICAL_TOP_K else None
+)
+
+# Query embeddings keyed on normalized query text, so repeat questions skip the model
+query_embedding_cache = LRUCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL_SECONDS)
+
+# Encode batch size for match_many (sentence-transformers sorts by length within it)
+MATCH_MANY_BATCH_SIZE = 64
+
+# Full answers (verse + commentary) for recent queries, matched by paraphrase
+semantic_cache = (
+    SemanticCache(
+        SEMANTIC_CACHE_SIZE,
+        SEMANTIC_CACHE_THRESHOLD,
+        EMBEDDING_DIMENSION,
+        max_age_seconds=COMMENTARY_CACHE_MAX_AGE_SECONDS,
     )
+    if SEMANTIC_CACHE_SIZE
+    else None
+)
+
 
-    if not results["matches"]:
+def get_verse(chapter: int, verse: int):
+    """Fetch a specific verse by chapter and verse number."""
+    metadata = verse_store.get(chapter, verse)
+    if metadata is None:
         return None
 
-    metadata = results["matches"][0]["metadata"]
     result = {
         "chapter": metadata["chapter"],
         "verse": metadata["verse"],
@@ -33,61 +81,237 @@ def get_verse(chapter: int, verse: int):
     return result
 
 
+def query_instruction(query: str) -> str:
+    """BGE models work best with instruction prefix for queries."""
+    return f"Represent this sentence for searching relevant passages: {query}"
+
+
+def embed_query(query: str) -> list[float]:
+    """Embed a user query for retrieval."""
+    key = normalize_query(query)
+    embedding = query_embedding_cache.get(key)
+    record_cache("query_embedding", embedding is not None)
+    if embedding is None:
+        with timed("embed"):
+            embedding = clients.embedding_model.encode(query_instruction(query))
+        query_embedding_cache.put(key, embedding)
+    return embedding.tolist()
+
+
+async def embed_query_async(query: str) -> list[float]:
+    """Embed a user query, batched with other in-flight queries."""
+    key = normalize_query(query)
+    embedding = query_embedding_cache.get(key)
+    record_cache("query_embedding", embedding is not None)
+    if embedding is None:
+        # Includes time queued for the next micro-batch
+        with timed("embed"):
+            embedding = await clients.embedding_batcher.encode(query_instruction(query))
+        query_embedding_cache.put(key, embedding)
+    return embedding.tolist()
+
+
+def search(query_embedding: list[float]):
+    """Fetch the top 8 candidate ids from the search index for hybrid search."""
+    # Metadata is hydrated from the verse store rather than sent over the wire
+    return clients.search_index.query(
+        vector=query_embedding, top_k=8, include_metadata=False
+    )
+
+
+async def search_async(query_embedding: list[float]):
+    """search() without blocking the event loop on a network call."""
+    with timed("search"):
+        if isinstance(clients.search_index, LocalIndex):
+            # In-process matrix product takes well under a millisecond
+            return search(query_embedding)
+        return await run_in_stage("search", search, query_embedding)
+
+
 def match(query):
     """Find the best matching verse for a query using semantic search."""
-    # BGE models work best with instruction prefix for queries
-    query_with_instruction = (
-        f"Represent this sentence for searching relevant passages: {query}"
-    )
-    query_embedding = embedding_model.encode(query_with_instruction).tolist()
+    query_embedding = embed_query(query)
+    with timed("search"):
+        results = search(query_embedding)
+    return rank_matches(query, results)
+
+
+async def match_async(query):
+    """Non-blocking match(): encoding and Pinecone calls run off the event loop."""
+    result, _ = await match_with_embedding_async(query)
+    return result
 
-    # Fetch top 8 matches from Pinecone for hybrid search
-    results = index.query(
-        vector=query_embedding, top_k=8, include_metadata=True
+
+async def match_with_embedding_async(query) -> tuple[dict | None, list[float]]:
+    """match_async(), plus the query embedding for the semantic cache."""
+    query_embedding = await embed_query_async(query)
+    results = await search_async(query_embedding)
+    return await rank_matches_async(query, results), query_embedding
+
+
+def embed_queries(queries: list[str]) -> np.ndarray:
+    """Embed many queries: cached ones are reused, the rest go through the model in one call."""
+    keys = [normalize_query(q) for q in queries]
+    embeddings = [query_embedding_cache.get(key) for key in keys]
+    for embedding in embeddings:
+        record_cache("query_embedding", embedding is not None)
+    # Duplicate questions in a batch are only encoded once
+    missing = {}
+    for i, embedding in enumerate(embeddings):
+        if embedding is None:
+            missing.setdefault(keys[i], queries[i])
+    if missing:
+        with timed("embed"):
+            encoded = clients.embedding_model.encode(
+                [query_instruction(q) for q in missing.values()],
+                batch_size=MATCH_MANY_BATCH_SIZE,
+            )
+        for key, embedding in zip(missing, encoded):
+            # Copied: a cached row view would keep the whole batch matrix alive
+            query_embedding_cache.put(key, embedding.copy())
+        fresh = dict(zip(missing, encoded))
+        embeddings = [fresh[key] if e is None else e for key, e in zip(keys, embeddings)]
+    return np.asarray(embeddings, dtype=np.float32).reshape(len(queries), -1)
+
+
+def search_many(query_embeddings: np.ndarray) -> list[dict]:
+    """search() for many embeddings: one matrix product locally, parallel calls on Pinecone."""
+    with timed("search"):
+        if isinstance(clients.search_index, LocalIndex):
+            return clients.search_index.query_many(query_embeddings, top_k=8)
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            return list(executor.map(search, query_embeddings.tolist()))
+
+
+def match_many(queries: list[str]) -> list[dict | None]:
+    """match() for many queries at once; results are in input order (None = no match)."""
+    if not queries:
+        return []
+    results = search_many(embed_queries(queries))
+    return [rank_matches(query, result) for query, result in zip(queries, results)]
+
+
+async def match_many_async(queries: list[str]) -> list[dict | None]:
+    """Non-blocking match_many(): one encode on the embed stage, then the searches."""
+    if not queries:
+        return []
+    query_embeddings = await run_in_stage("embed", embed_queries, queries)
+    if isinstance(clients.search_index, LocalIndex):
+        results = search_many(query_embeddings)
+    else:
+        results = await asyncio.gather(
+            *(search_async(embedding) for embedding in query_embeddings.tolist())
+        )
+    return await asyncio.gather(
+        *(rank_matches_async(query, result) for query, result in zip(queries, results))
     )
 
-    if not results["matches"]:
+
+def find_similar_answer(query_embedding: list[float], result: dict) -> dict | None:
+    """Stored answer for a paraphrase of this query that matched the same verse."""
+    if semantic_cache is None:
         return None
+    answer = semantic_cache.lookup(query_embedding, result["chapter"], result["verse"])
+    record_cache("semantic", answer is not None)
+    return answer
+
 
-    # Build a list of semantic matches with scores
-    semantic_matches = []
-    for i, match in enumerate(results["matches"]):
-        meta = match["metadata"]
-        semantic_matches.append(
+def remember_answer(query: str, query_embedding: list[float], answer: dict):
+    """Add a generated answer to the semantic cache."""
+    if semantic_cache is not None:
+        semantic_cache.add(query, query_embedding, answer)
+
+
+def fuse_rankings(*rankings: list[str], k: int = RRF_K) -> dict[str, float]:
+    """Reciprocal rank fusion: id -> sum of 1 / (k + rank) over every ranking it is in."""
+    fused: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, vector_id in enumerate(ranking, start=1):
+            fused[vector_id] = fused.get(vector_id, 0.0) + 1.0 / (k + rank)
+    return fused
+
+
+def candidate_matches(query, results) -> list[dict]:
+    """Hydrate dense search results and fuse them with BM25 results for the query."""
+    dense_ids = [match["id"] for match in results["matches"]]
+    lexical_ids = []
+    if lexical_index is not None:
+        with timed("lexical"):
+            lexical_ids = [m["id"] for m in lexical_index.query(query, LEXICAL_TOP_K)["matches"]]
+    fused = fuse_rankings(dense_ids, lexical_ids)
+
+    # Candidates in dense order first, so ties in fused score keep the dense ranking
+    candidates = []
+    for vector_id in dict.fromkeys(dense_ids + lexical_ids):
+        meta = verse_store.get_by_id(vector_id)
+        if meta is None:
+            logging.warning(f"Search returned unknown vector id {vector_id}")
+            continue
+        candidates.append(
             {
+                "id": vector_id,
                 "chapter": meta["chapter"],
                 "verse": meta["verse"],
                 "translation": meta["translation"],
                 "summary": meta.get("summary", ""),
                 "commentary": meta.get("commentary", ""),
-                "semantic_rank": i,
-                "semantic_score": match["score"],
-                "keyword_boost": 0,
+                "combined_score": fused[vector_id],
             }
         )
 
-    # Keyword matching: boost results that contain query terms
-    query_lower = query.lower()
-    query_terms = [term.strip() for term in query_lower.split() if len(term.strip()) > 2]
+    # Sort by fused score (descending)
+    candidates.sort(key=lambda x: x["combined_score"], reverse=True)
+    return candidates
+
 
-    for match in semantic_matches:
-        text = (match["translation"] + " " + match["summary"]).lower()
-        # Count how many query terms appear in the text
-        term_matches = sum(1 for term in query_terms if term in text)
-        if term_matches > 0:
-            # Boost based on term match ratio
-            match["keyword_boost"] = term_matches / len(query_terms) if query_terms else 0
+def rerank(query, candidates: list[dict], deadline: float | None = None) -> list[dict]:
+    """
+    Re-order the top RERANK_TOP_N candidates by cross-encoder score.
+    Keeps the fused order when re-ranking is off or would run past the
+    deadline (default: RERANK_BUDGET_MS from now).
+    """
+    if not RERANK_TOP_N or len(candidates) < 2:
+        return candidates
+    if deadline is None:
+        deadline = time.perf_counter() + RERANK_BUDGET_MS / 1000
+    head = candidates[:RERANK_TOP_N]
+    scores = clients.reranker.score(
+        query, {c["id"]: f"{c['translation']} {c['summary']}" for c in head}, deadline
+    )
+    if scores is None:
+        record_fallback("rerank_budget")
+        return candidates
+    head = sorted(head, key=lambda c: scores[c["id"]], reverse=True)
+    return head + candidates[RERANK_TOP_N:]
+
+
+def rank_matches(query, results):
+    """Fuse, optionally re-rank and shape search results into an answer."""
+    candidates = candidate_matches(query, results)
+    if RERANK_TOP_N and len(candidates) > 1:
+        with timed("rerank"):
+            candidates = rerank(query, candidates)
+    return build_answer(candidates)
 
-    # Re-rank: combine semantic score with keyword boost
-    # semantic_score is typically 0-1, keyword_boost is 0-1
-    for match in semantic_matches:
-        match["combined_score"] = match["semantic_score"] + (match["keyword_boost"] * 0.15)
 
-    # Sort by combined score (descending)
-    semantic_matches.sort(key=lambda x: x["combined_score"], reverse=True)
+async def rank_matches_async(query, results):
+    """rank_matches() with re-ranking on its own thread pool, off the event loop."""
+    candidates = candidate_matches(query, results)
+    if RERANK_TOP_N and len(candidates) > 1:
+        # The budget includes time spent queued behind other requests
+        deadline = time.perf_counter() + RERANK_BUDGET_MS / 1000
+        with timed("rerank"):
+            candidates = await run_in_stage("rerank", rerank, query, candidates, deadline)
+    return build_answer(candidates)
+
+
+def build_answer(candidates: list[dict]):
+    """Best candidate as the answer, with the next three unique verses as related."""
+    if not candidates:
+        return None
 
     # Main result (best combined match)
-    best = semantic_matches[0]
+    best = candidates[0]
     main_result = {
         "chapter": best["chapter"],
         "verse": best["verse"],
@@ -100,7 +324,7 @@ def match(query):
     # Related verses (next 3 unique verses)
     related = []
     seen = {(best["chapter"], best["verse"])}
-    for match in semantic_matches[1:]:
+    for match in candidates[1:]:
         key = (match["chapter"], match["verse"])
         if key not in seen:
             related.append(
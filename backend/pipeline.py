@@ -0,0 +1,65 @@
+"""
+Non-blocking request pipeline stages for GitaChat.
+Blocking work (embedding, Pinecone calls, SQLite) runs on bounded per-stage thread
+pools so the event loop stays free; each stage also has a concurrency limit
+so one slow dependency cannot queue up unbounded work.
+"""
+
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from config import (
+    EMBED_WORKERS,
+    EMBED_CONCURRENCY,
+    SEARCH_CONCURRENCY,
+    LLM_CONCURRENCY,
+)
+
+# stage -> (thread pool size, max requests in flight)
+STAGES = {
+    "embed": (EMBED_WORKERS, EMBED_CONCURRENCY),
+    "rerank": (1, EMBED_CONCURRENCY),  # CPU-bound cross-encoder, off by default
+    "search": (SEARCH_CONCURRENCY, SEARCH_CONCURRENCY),
+    "llm": (0, LLM_CONCURRENCY),  # async client, no thread pool
+    "cache": (2, 64),  # local SQLite reads/writes
+}
+
+# Created on first use, so each (forked) worker process gets its own
+_executors: dict[str, ThreadPoolExecutor] = {}
+_semaphores: dict[str, asyncio.Semaphore] = {}
+
+
+def stage_limit(stage: str) -> asyncio.Semaphore:
+    """Semaphore bounding how many requests may be inside a stage at once."""
+    if stage not in _semaphores:
+        _semaphores[stage] = asyncio.Semaphore(STAGES[stage][1])
+    return _semaphores[stage]
+
+
+def _executor(stage: str) -> ThreadPoolExecutor:
+    if stage not in _executors:
+        _executors[stage] = ThreadPoolExecutor(
+            max_workers=STAGES[stage][0], thread_name_prefix=f"gitachat-{stage}"
+        )
+    return _executors[stage]
+
+
+async def run_in_stage(stage: str, fn, *args, **kwargs):
+    """Run a blocking function on the stage's thread pool, within its limit."""
+    async with stage_limit(stage):
+        loop = asyncio.get_running_loop()
+        # In the caller's context (as asyncio.to_thread does), so metrics.timed()
+        # inside fn reaches the request's Server-Timing header
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(_executor(stage), partial(context.run, fn, *args, **kwargs))
+
+
+def shutdown():
+    """Stop the stage thread pools (called on app shutdown)."""
+    for executor in _executors.values():
+        executor.shutdown(wait=False, cancel_futures=True)
+    _executors.clear()
+    # Bound to this run's event loop; a restarted app gets new ones
+    _semaphores.clear()
@@ -1,22 +1,53 @@
 """
 Precompute summaries for all verses and upload to Pinecone.
+
+Incremental and resumable: every verse's commentary is hashed (together with
+the summary model and prompt version), and a verse is only re-summarized when
+that hash changes. Only vectors whose metadata or embedding changed since
+their last successful upsert are sent to Pinecone. Progress is appended to a
+local checkpoint file as it happens, so an interrupted run resumes where it
+stopped, and re-running after a small data fix touches only what changed.
+
+    python precompute_summaries.py
+    python precompute_summaries.py --dry-run              # what would change
+    python precompute_summaries.py --seed-from-snapshot   # reuse summaries already in the snapshot
+    python precompute_summaries.py --force                # regenerate everything
+
+Summaries and upserts that still fail after retries are reported and left
+for the next run; the exit code is non-zero if anything failed.
 """
 
-from tqdm import tqdm
+import argparse
+import json
+import os
+import sys
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from config import MAX_WORKERS, BATCH_SIZE
-from clients import index, embedding_model
-from utils import summarize, load_verses_from_pickle
+import numpy as np
+from tqdm import tqdm
+
+import clients
+from config import BATCH_SIZE, MAX_WORKERS, SNAPSHOT_DIR
+from snapshot import MANIFEST_FILE, content_hash, load_snapshot
+from utils import SUMMARY_PROMPT_VERSION, summarize, with_retries
+from verse_table import load_corpus
+
+CHECKPOINT_FILE = "cache/precompute_state.jsonl"
+SUMMARY_MODEL = "gpt-4o-mini"
+
+
+def vector_id(verse: dict) -> str:
+    return f"ch{verse['chapter']}_v{verse['verse']}"
 
 
-def process_verse(verse, embedding):
-    """Process a single verse: generate summary and prepare vector."""
-    vector_id = f"ch{verse['chapter']}_v{verse['verse']}"
-    summary = summarize(verse["commentary"])
+def commentary_hash(commentary: str) -> str:
+    return content_hash(SUMMARY_MODEL, SUMMARY_PROMPT_VERSION, commentary or "")
+
+
+def build_vector(verse: dict, embedding, summary: str) -> dict:
     return {
-        "id": vector_id,
-        "values": embedding.tolist(),
+        "id": vector_id(verse),
+        "values": np.asarray(embedding, dtype=np.float32).tolist(),
         "metadata": {
             "chapter": verse["chapter"],
             "verse": verse["verse"],
@@ -27,40 +58,218 @@ def process_verse(verse, embedding):
     }
 
 
-def precompute():
+def vector_hash(vector: dict) -> str:
+    metadata = json.dumps(vector["metadata"], sort_keys=True, ensure_ascii=False)
+    return content_hash(metadata, np.asarray(vector["values"], dtype=np.float32).tobytes())
+
+
+class Checkpoint:
+    """
+    Append-only JSONL log of completed work, replayed on load (last record wins):
+        {"id": ..., "commentary_hash": ..., "summary": ...}   summary generated
+        {"id": ..., "upserted": <vector hash>}                vector is in Pinecone
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.summaries: dict[str, tuple[str, str]] = {}
+        self.upserted: dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except json.JSONDecodeError:
+                        # A torn last line from a crash; everything before it is intact
+                        continue
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        if self._file.tell() and not self._ends_with_newline():
+            self._file.write("\n")
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _apply(self, record: dict):
+        if "summary" in record:
+            self.summaries[record["id"]] = (record["commentary_hash"], record["summary"])
+        if "upserted" in record:
+            self.upserted[record["id"]] = record["upserted"]
+
+    def _append(self, records: list[dict]):
+        for record in records:
+            self._apply(record)
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def summary_for(self, verse_id: str, hash_: str) -> str | None:
+        cached = self.summaries.get(verse_id)
+        return cached[1] if cached and cached[0] == hash_ else None
+
+    def record_summary(self, verse_id: str, hash_: str, summary: str):
+        self._append([{"id": verse_id, "commentary_hash": hash_, "summary": summary}])
+
+    def record_upserted(self, hashes: dict[str, str]):
+        self._append([{"id": verse_id, "upserted": h} for verse_id, h in hashes.items()])
+
+    def compact(self):
+        """Rewrite the log with one record per verse (atomically)."""
+        self._file.close()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for verse_id in sorted(self.summaries.keys() | self.upserted.keys()):
+                record = {"id": verse_id}
+                if verse_id in self.summaries:
+                    record["commentary_hash"], record["summary"] = self.summaries[verse_id]
+                if verse_id in self.upserted:
+                    record["upserted"] = self.upserted[verse_id]
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        self._file.close()
+
+
+def seed_from_snapshot(checkpoint: Checkpoint, verses, snapshot_dir: str) -> int:
+    """Adopt summaries from a snapshot of the live index wherever the commentary is unchanged."""
+    with open(os.path.join(snapshot_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    snapshot = load_snapshot(snapshot_dir, manifest["model"], manifest["dimension"])
+    live = {
+        verse_id: (snapshot.columns["commentary"][i], snapshot.columns["summary"][i])
+        for i, verse_id in enumerate(snapshot.ids)
+    }
+    seeded = 0
+    for verse in verses:
+        verse_id = vector_id(verse)
+        hash_ = commentary_hash(verse["commentary"])
+        commentary, summary = live.get(verse_id, (None, ""))
+        if summary and commentary == verse["commentary"] and checkpoint.summary_for(verse_id, hash_) is None:
+            checkpoint.record_summary(verse_id, hash_, summary)
+            seeded += 1
+    return seeded
+
+
+class Uploader:
+    """Buffers changed vectors and upserts them in batches, checkpointing each batch."""
+
+    def __init__(self, checkpoint: Checkpoint, retries: int):
+        self.checkpoint = checkpoint
+        self.retries = retries
+        self.pending: list[tuple[dict, str]] = []
+        self.upserted = 0
+        self.failed: list[str] = []
+
+    def add(self, vector: dict, hash_: str):
+        self.pending.append((vector, hash_))
+        if len(self.pending) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        try:
+            with_retries(clients.index.upsert, vectors=[v for v, _ in batch], attempts=self.retries + 1)
+        except Exception as e:
+            print(f"Upsert of {len(batch)} vectors failed: {e}")
+            self.failed += [v["id"] for v, _ in batch]
+            return
+        self.checkpoint.record_upserted({v["id"]: h for v, h in batch})
+        self.upserted += len(batch)
+
+
+def precompute(args) -> int:
     print("Loading existing embeddings and verses...")
-    verses, embeddings = load_verses_from_pickle()
+    verses, embeddings = load_corpus()
+    print(f"Found {len(verses)} verses")
+
+    checkpoint = Checkpoint(args.checkpoint)
+    if args.force:
+        checkpoint.summaries.clear()
+        checkpoint.upserted.clear()
+    if args.seed_from_snapshot:
+        print(f"Seeded {seed_from_snapshot(checkpoint, verses, args.seed_from_snapshot)} summaries from snapshot")
+
+    # Verses whose commentary changed (or was never summarized) need the LLM
+    to_summarize = []
+    ready = []
+    for verse, embedding in zip(verses, embeddings):
+        hash_ = commentary_hash(verse["commentary"])
+        summary = checkpoint.summary_for(vector_id(verse), hash_)
+        if summary is None:
+            to_summarize.append((verse, embedding, hash_))
+        else:
+            ready.append((verse, embedding, summary))
 
-    print(f"Found {len(verses)} verses to process")
-    print(f"Processing with {MAX_WORKERS} parallel threads...")
+    # Of the rest, only vectors that differ from their last successful upsert are sent
+    changed = []
+    for verse, embedding, summary in ready:
+        vector = build_vector(verse, embedding, summary)
+        hash_ = vector_hash(vector)
+        if checkpoint.upserted.get(vector["id"]) != hash_:
+            changed.append((vector, hash_))
 
-    vectors = []
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {
-            executor.submit(process_verse, verse, emb): i
-            for i, (verse, emb) in enumerate(zip(verses, embeddings))
-        }
+    print(
+        f"{len(to_summarize)} to summarize, {len(changed)} changed vectors to upsert, "
+        f"{len(ready) - len(changed)} unchanged"
+    )
+    if args.dry_run:
+        checkpoint.close()
+        return 0
 
-        for future in tqdm(as_completed(futures), total=len(futures)):
-            try:
-                vector = future.result()
-                vectors.append(vector)
+    uploader = Uploader(checkpoint, args.retries)
+    for vector, hash_ in changed:
+        uploader.add(vector, hash_)
 
-                # Upload in batches
-                if len(vectors) >= BATCH_SIZE:
-                    index.upsert(vectors=vectors)
-                    vectors = []
-            except Exception as e:
-                print(f"Error: {e}")
+    failed_summaries = []
+    if to_summarize:
+        print(f"Summarizing with {MAX_WORKERS} parallel threads...")
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = {
+                executor.submit(with_retries, summarize, verse["commentary"], attempts=args.retries + 1):
+                (verse, embedding, hash_)
+                for verse, embedding, hash_ in to_summarize
+            }
+            for future in tqdm(as_completed(futures), total=len(futures)):
+                verse, embedding, hash_ = futures[future]
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    print(f"Error summarizing {vector_id(verse)}: {e}")
+                    failed_summaries.append(vector_id(verse))
+                    continue
+                # Checkpointed before the upsert, so a crash never pays for this summary twice
+                checkpoint.record_summary(vector_id(verse), hash_, summary)
+                vector = build_vector(verse, embedding, summary)
+                uploader.add(vector, vector_hash(vector))
+    uploader.flush()
 
-    # Upload remaining
-    if vectors:
-        index.upsert(vectors=vectors)
+    checkpoint.compact()
+    checkpoint.close()
 
-    print("\nDone! All summaries pre-computed and uploaded to Pinecone.")
-    stats = index.describe_index_stats()
-    print(f"Index stats: {stats}")
+    print(f"\nSummarized {len(to_summarize) - len(failed_summaries)}, upserted {uploader.upserted} vectors")
+    if failed_summaries or uploader.failed:
+        failed = failed_summaries + uploader.failed
+        print(
+            f"Failed: {len(failed_summaries)} summaries, {len(uploader.failed)} upserts "
+            f"({', '.join(failed[:10])}{', ...' if len(failed) > 10 else ''}). Re-run to retry them."
+        )
+        return 1
+    if uploader.upserted:
+        print(f"Index stats: {clients.index.describe_index_stats()}")
+    return 0
 
 
 if __name__ == "__main__":
-    precompute()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE, help="progress file (default: %(default)s)")
+    parser.add_argument("--force", action="store_true", help="ignore the checkpoint and redo every verse")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be summarized and upserted")
+    parser.add_argument("--retries", type=int, default=3, help="retries per summary and per upsert batch")
+    parser.add_argument("--seed-from-snapshot", nargs="?", const=SNAPSHOT_DIR, metavar="DIR",
+                        help="reuse summaries from a snapshot (default: %(const)s) where the commentary matches")
+    sys.exit(precompute(parser.parse_args()))
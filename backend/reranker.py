@@ -0,0 +1,118 @@
+"""
+Optional cross-encoder re-ranking for GitaChat.
+Scores (query, verse) pairs jointly, which orders close candidates better
+than embedding similarity, at the cost of a forward pass per pair. Scoring is
+batched and bounded by a per-request deadline: when the next batch would not
+finish in time, the caller keeps its existing ordering instead.
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from cache import LRUCache, normalize_query
+
+
+def _percentile(values, q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def load_cross_encoder(model_name: str, max_length: int = 512):
+    """Build a sentence-transformers CrossEncoder on CPU."""
+    import torch
+    from sentence_transformers import CrossEncoder
+
+    # Same single-thread budget as the embedding model (see config.py)
+    torch.set_num_threads(1)
+    return CrossEncoder(model_name, max_length=max_length, device="cpu")
+
+
+class CrossEncoderReranker:
+    """Batched, deadline-bounded cross-encoder scoring with a (query, verse) score cache."""
+
+    def __init__(self, model, batch_size: int = 8, cache_size: int = 20000):
+        self.model = model
+        self.batch_size = batch_size
+        self.cache = LRUCache(cache_size)
+        self._lock = threading.Lock()
+
+        # Stats
+        self._calls = 0
+        self._completed = 0
+        self._over_budget = 0
+        self._late = 0
+        self._pairs_scored = 0
+        self._added_ms: deque = deque(maxlen=1000)
+        self._pair_ms = 0.0  # moving average of model time per pair, for deadline checks
+
+    def score(self, query: str, documents: dict[str, str], deadline: float) -> dict[str, float] | None:
+        """
+        Relevance score per document id, or None if scoring cannot finish by
+        the deadline (a time.perf_counter() value).
+        """
+        started = time.perf_counter()
+        key = normalize_query(query)
+        scores = {}
+        pending = []
+        for doc_id in documents:
+            cached = self.cache.get((key, doc_id))
+            if cached is None:
+                pending.append(doc_id)
+            else:
+                scores[doc_id] = cached
+
+        completed = True
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start : start + self.batch_size]
+            # Give up before a batch that would overrun rather than after it
+            if time.perf_counter() + self._pair_ms / 1000 * len(batch) > deadline:
+                completed = False
+                break
+            batch_started = time.perf_counter()
+            batch_scores = self.model.predict(
+                [(query, documents[doc_id]) for doc_id in batch],
+                batch_size=len(batch),
+                show_progress_bar=False,
+            )
+            elapsed_ms = (time.perf_counter() - batch_started) * 1000
+            with self._lock:
+                per_pair = elapsed_ms / len(batch)
+                self._pair_ms = per_pair if not self._pair_ms else 0.8 * self._pair_ms + 0.2 * per_pair
+                self._pairs_scored += len(batch)
+            # Scores already paid for are kept, so a retry only scores the rest
+            for doc_id, value in zip(batch, batch_scores):
+                scores[doc_id] = float(value)
+                self.cache.put((key, doc_id), float(value))
+
+        with self._lock:
+            self._calls += 1
+            if completed:
+                self._completed += 1
+                # Finished, but a batch took longer than estimated; the scores are still used
+                if time.perf_counter() > deadline:
+                    self._late += 1
+            else:
+                self._over_budget += 1
+            self._added_ms.append((time.perf_counter() - started) * 1000)
+        return scores if completed else None
+
+    def stats(self) -> dict:
+        """Latency added per request and how often the budget forced a fallback."""
+        added = list(self._added_ms)
+        return {
+            "calls": self._calls,
+            "reranked": self._completed,
+            "over_budget": self._over_budget,
+            "late": self._late,
+            "pairs_scored": self._pairs_scored,
+            "ms_per_pair": self._pair_ms,
+            "added_ms": {
+                "p50": _percentile(added, 50),
+                "p95": _percentile(added, 95),
+                "p99": _percentile(added, 99),
+                "max": max(added, default=0.0),
+            },
+            "score_cache": self.cache.stats(),
+        }
@@ -0,0 +1,85 @@
+"""
+Pre-encoded, compressed responses for read-only endpoints.
+Payloads that only change with the corpus (/api/all-verses, /api/verse) are
+serialized and compressed once, then served with strong ETags and
+Cache-Control; a matching If-None-Match gets an empty 304.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+def _etag_values(header: str) -> set[str]:
+    """Opaque tags from an If-None-Match header (weak prefixes ignored)."""
+    return {tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()}
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class EncodedPayload:
+    """One JSON payload, serialized once with identity, gzip and brotli variants."""
+
+    def __init__(self, data, max_age: int):
+        self.body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        # Content hash: identical corpus -> identical ETag on every worker
+        digest = hashlib.sha256(self.body).hexdigest()[:20]
+        self.cache_control = f"public, max-age={max_age}"
+        # Strong ETags must differ per content-coding
+        self.variants = {"identity": (self.body, f'"{digest}"')}
+        self.variants["gzip"] = (gzip.compress(self.body, compresslevel=9, mtime=0), f'"{digest}-gz"')
+        if brotli is not None:
+            self.variants["br"] = (brotli.compress(self.body, quality=11), f'"{digest}-br"')
+        self._etags = {etag for _, etag in self.variants.values()}
+
+    def response(self, request: Request) -> Response:
+        """Best encoding the client accepts, or 304 if its cached copy is current."""
+        accept_encoding = request.headers.get("accept-encoding", "")
+        coding = "identity"
+        for candidate in ("br", "gzip"):
+            if candidate in self.variants and _accepts(accept_encoding, candidate):
+                coding = candidate
+                break
+        content, etag = self.variants[coding]
+        headers = {"ETag": etag, "Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+
+        # Any variant's tag means the client already holds the current content
+        if _etag_values(request.headers.get("if-none-match", "")) & self._etags:
+            return Response(status_code=304, headers=headers)
+        if coding != "identity":
+            headers["Content-Encoding"] = coding
+        return Response(content=content, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """Encoded payloads by key, built on first request and kept for the process."""
+
+    def __init__(self, max_age: int):
+        self.max_age = max_age
+        self._payloads: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, build) -> EncodedPayload:
+        """Cached payload for key, building it from build() on first use."""
+        payload = self._payloads.get(key)
+        if payload is None:
+            with self._lock:
+                payload = self._payloads.get(key)
+                if payload is None:
+                    payload = EncodedPayload(build(), self.max_age)
+                    self._payloads[key] = payload
+        return payload
@@ -1,70 +1,276 @@
-import os
-import json
+"""
+Scrape every verse (translation + commentary) into data/chapter_<c>/verse_<v>.json.
+
+All chapters are fetched concurrently over one pooled aiohttp session, with
+a bound on requests in flight and jittered retries for timeouts, 429s and
+5xx. Pages are kept in an on-disk HTTP cache and revalidated with
+If-None-Match / If-Modified-Since, so a re-run downloads only pages that
+changed (304s are cheap) and only rewrites files whose content changed.
+HTML is parsed in a process pool, off the event loop.
+
+Progress is recorded in a resume manifest (data/.scrape_manifest.json):
+an interrupted run picks up where it stopped without re-requesting
+verses it already finished, and chapter lengths learned by one run let
+the next one fetch every verse of a chapter at once.
+
+    python scrape.py
+    python scrape.py --concurrency 16
+    python scrape.py --base-url http://127.0.0.1:8100   # against fake_services.py
+"""
+
+import argparse
 import asyncio
-from bs4 import BeautifulSoup
+import hashlib
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import aiohttp
-from tqdm.asyncio import tqdm
+from bs4 import BeautifulSoup
+from tqdm import tqdm
 
-BASE_URL = "https://www.holy-bhagavad-gita.org/chapter/{}/verse/{}"
+BASE_URL = "https://www.holy-bhagavad-gita.org"
+VERSE_PATH = "/chapter/{}/verse/{}"
 DATA_DIR = "data"
+CACHE_DIR = "cache/http"
+MANIFEST_FILE = ".scrape_manifest.json"
+CHAPTERS = 18
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
 
-async def fetch_verse(session, chapter, verse):
-    url = BASE_URL.format(chapter, verse)
-    async with session.get(url, timeout=5) as response:
-        return await response.text()
 
-async def process_verse(session, chapter, verse):
-    html_content = await fetch_verse(session, chapter, verse)
-    
-    soup = BeautifulSoup(html_content, 'html.parser')
+def parse_verse(html_content: str, chapter: int, verse: int) -> dict | None:
+    """Translation and commentary from a verse page; None if the page has no verse."""
+    soup = BeautifulSoup(html_content, "html.parser")
     translation_section = soup.find("div", {"class": "bg-verse-translation"})
     if translation_section is None:
-        return None  
-    
-    translation = translation_section.get_text(strip=True)
+        return None
+
     commentary_section = soup.find("div", {"class": "bg-verse-commentary"})
-    commentary = commentary_section.get_text(strip=True) if commentary_section else ""
-    
     return {
         "chapter": chapter,
         "verse": verse,
-        "translation": translation,
-        "commentary": commentary
+        "translation": translation_section.get_text(strip=True),
+        "commentary": commentary_section.get_text(strip=True) if commentary_section else "",
     }
 
-async def save_verse(verse_data):
-    chapter_dir = os.path.join(DATA_DIR, f"chapter_{verse_data['chapter']}")
+
+class HttpCache:
+    """Response bodies plus their ETag/Last-Modified, one file pair per URL."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url: str) -> tuple[str, str]:
+        base = os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest())
+        return f"{base}.json", f"{base}.body"
+
+    def get(self, url: str) -> tuple[dict, str] | None:
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, encoding="utf-8") as f:
+                return meta, f.read()
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, url: str, headers, body: str):
+        meta_path, body_path = self._paths(url)
+        with open(body_path, "w", encoding="utf-8") as f:
+            f.write(body)
+        # Metadata last: a body without it is never used
+        with open(meta_path, "w") as f:
+            json.dump({"url": url, "etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")}, f)
+
+
+class Fetcher:
+    """Conditional GETs through the cache, with bounded concurrency and retries."""
+
+    def __init__(self, session: aiohttp.ClientSession, cache: HttpCache, concurrency: int, retries: int):
+        self.session = session
+        self.cache = cache
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.retries = retries
+        self.counts = dict.fromkeys(("requests", "downloaded", "not_modified", "missing", "retries"), 0)
+
+    async def fetch(self, url: str) -> tuple[str | None, bool]:
+        """(body, changed): body is None for a 404; changed is False when the cached copy was still valid."""
+        cached = self.cache.get(url)
+        headers = {}
+        if cached:
+            if cached[0].get("etag"):
+                headers["If-None-Match"] = cached[0]["etag"]
+            if cached[0].get("last_modified"):
+                headers["If-Modified-Since"] = cached[0]["last_modified"]
+
+        for attempt in range(self.retries + 1):
+            try:
+                async with self.semaphore:
+                    self.counts["requests"] += 1
+                    async with self.session.get(url, headers=headers) as response:
+                        if response.status == 304 and cached:
+                            self.counts["not_modified"] += 1
+                            return cached[1], False
+                        if response.status == 404:
+                            self.counts["missing"] += 1
+                            return None, True
+                        if response.status not in RETRYABLE_STATUSES:
+                            response.raise_for_status()
+                            body = await response.text()
+                            self.cache.put(url, response.headers, body)
+                            self.counts["downloaded"] += 1
+                            return body, True
+                        error = aiohttp.ClientResponseError(
+                            response.request_info, response.history, status=response.status
+                        )
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error = e
+            if attempt == self.retries:
+                raise error
+            self.counts["retries"] += 1
+            await asyncio.sleep(random.uniform(0, 0.5 * 2**attempt))
+
+
+def load_manifest(data_dir: str) -> dict:
+    try:
+        with open(os.path.join(data_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"complete": True, "chapters": {}, "done": []}
+
+
+def save_manifest(data_dir: str, manifest: dict):
+    path = os.path.join(data_dir, MANIFEST_FILE)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def save_verse(data_dir: str, verse_data: dict) -> bool:
+    """Write a verse file if its content changed; returns whether it was written."""
+    chapter_dir = os.path.join(data_dir, f"chapter_{verse_data['chapter']}")
     os.makedirs(chapter_dir, exist_ok=True)
-    
-    verse_file_path = os.path.join(chapter_dir, f"verse_{verse_data['verse']}.json")
-    with open(verse_file_path, "w", encoding="utf-8") as file:
-        json.dump(verse_data, file, ensure_ascii=False, indent=4)
-
-async def process_chapter(session, chapter, verse_pbar):
-    verse = 1
-    results = []
-    while True:
-        result = await process_verse(session, chapter, verse)
-        if result is None:
-            break
-        await save_verse(result)
-        results.append(result)
-        verse += 1
-        verse_pbar.update(1)
-    return results
-
-async def main():
-    async with aiohttp.ClientSession() as session:
-        chapter_pbar = tqdm(total=18, desc="Processing chapters", position=0)
-        verse_pbar = tqdm(desc="Processing verses", position=1, leave=False)
-
-        for chapter in range(1, 19):
-            await process_chapter(session, chapter, verse_pbar)
-            chapter_pbar.update(1)
-
-        chapter_pbar.close()
-        verse_pbar.close()
-
-    print("[bold green]All verses have been processed and saved![/bold green]")
-
-asyncio.run(main())
+    path = os.path.join(chapter_dir, f"verse_{verse_data['verse']}.json")
+    content = json.dumps(verse_data, ensure_ascii=False, indent=4)
+    try:
+        with open(path, encoding="utf-8") as f:
+            if f.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return True
+
+
+class Scraper:
+    def __init__(self, fetcher: Fetcher, pool: ProcessPoolExecutor, args, manifest: dict):
+        self.fetcher = fetcher
+        self.pool = pool
+        self.base_url = args.base_url.rstrip("/")
+        self.data_dir = args.data_dir
+        self.window = args.window
+        self.manifest = manifest
+        self.done = set(manifest["done"])
+        self.written = 0
+        self.progress = tqdm(desc="Verses", unit="verse")
+        self._last_save = 0.0
+
+    def checkpoint(self, force: bool = False):
+        # Throttled: the manifest is rewritten at most once a second
+        if force or time.monotonic() - self._last_save > 1:
+            self.manifest["done"] = sorted(self.done)
+            save_manifest(self.data_dir, self.manifest)
+            self._last_save = time.monotonic()
+
+    async def verse(self, chapter: int, verse: int) -> bool:
+        """Fetch, parse and save one verse; False if the chapter has no such verse."""
+        key = f"{chapter}:{verse}"
+        if key in self.done:
+            return True
+        body, changed = await self.fetcher.fetch(self.base_url + VERSE_PATH.format(chapter, verse))
+        if body is None:
+            return False
+        path = os.path.join(self.data_dir, f"chapter_{chapter}", f"verse_{verse}.json")
+        if changed or not os.path.exists(path):
+            loop = asyncio.get_running_loop()
+            verse_data = await loop.run_in_executor(self.pool, parse_verse, body, chapter, verse)
+            if verse_data is None:
+                return False
+            self.written += save_verse(self.data_dir, verse_data)
+        self.done.add(key)
+        self.progress.update(1)
+        self.checkpoint()
+        return True
+
+    async def chapter(self, chapter: int):
+        """
+        Every verse of a chapter. Verses are fetched a window at a time (or all
+        at once when a previous run learned the chapter's length) until the
+        first missing one.
+        """
+        known = self.manifest["chapters"].get(str(chapter))
+        start, size = 1, (known + 1 if known else self.window)
+        while True:
+            numbers = range(start, start + size)
+            found = await asyncio.gather(*(self.verse(chapter, n) for n in numbers))
+            if not all(found):
+                last = start + found.index(False) - 1
+                break
+            start, size = start + size, self.window
+        self.manifest["chapters"][str(chapter)] = last
+
+    async def run(self, chapters: list[int]):
+        self.manifest["complete"] = False
+        try:
+            await asyncio.gather(*(self.chapter(c) for c in chapters))
+            self.manifest["complete"] = True
+            self.done.clear()
+        finally:
+            # Also on errors and Ctrl-C, so the next run resumes from here
+            self.progress.close()
+            self.checkpoint(force=True)
+
+
+async def main(args):
+    os.makedirs(args.data_dir, exist_ok=True)
+    manifest = load_manifest(args.data_dir)
+    if manifest["complete"] or args.restart:
+        # New run: every verse is revalidated (cheaply, through the HTTP cache)
+        manifest["done"] = []
+    else:
+        print(f"Resuming: {len(manifest['done'])} verses already done")
+
+    started = time.perf_counter()
+    connector = aiohttp.TCPConnector(limit=args.concurrency, limit_per_host=args.concurrency)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    with ProcessPoolExecutor(max_workers=args.parse_workers) as pool:
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            fetcher = Fetcher(session, HttpCache(args.cache_dir), args.concurrency, args.retries)
+            scraper = Scraper(fetcher, pool, args, manifest)
+            await scraper.run(list(range(1, CHAPTERS + 1)))
+
+    counts = fetcher.counts
+    total = sum(manifest["chapters"].values())
+    print(
+        f"\nDone! {total} verses in {time.perf_counter() - started:.1f}s: {counts['requests']} requests, "
+        f"{counts['downloaded']} downloaded, {counts['not_modified']} not modified, "
+        f"{counts['retries']} retries; {scraper.written} files written."
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="on-disk HTTP cache")
+    parser.add_argument("--concurrency", type=int, default=8, help="max requests in flight")
+    parser.add_argument("--window", type=int, default=8, help="verses probed at once in a chapter of unknown length")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=15, help="seconds per request")
+    parser.add_argument("--parse-workers", type=int, default=os.cpu_count() or 1, help="HTML parsing processes")
+    parser.add_argument("--restart", action="store_true", help="ignore an interrupted run's progress")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,116 @@
+"""
+Semantic answer cache for GitaChat.
+Keeps recent query embeddings in a fixed-size ring buffer and reuses a stored
+answer when a new query is a close paraphrase (cosine similarity above a
+threshold) and search lands on the same top verse. Entries expire after
+the same max age as the commentary cache.
+"""
+
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+# Similarity histogram buckets (lower bounds) for tuning the threshold
+SIMILARITY_BUCKETS = (0.0, 0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.925, 0.95, 0.975, 0.99)
+
+
+def _bucket(similarity: float) -> str:
+    for lower in reversed(SIMILARITY_BUCKETS):
+        if similarity >= lower:
+            return f">={lower}"
+    return "<0"
+
+
+class SemanticCache:
+    """Nearest-neighbour cache of answers over recent query embeddings."""
+
+    def __init__(self, capacity: int, threshold: float, dimension: int, max_age_seconds: float = 0):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.max_age = max_age_seconds  # 0 = entries never expire
+        self._matrix = np.zeros((capacity, dimension), dtype=np.float32)
+        self._stored_at = np.zeros(capacity, dtype=np.float64)
+        self._entries: list[dict | None] = [None] * capacity
+        self._next = 0  # ring buffer slot to overwrite next (oldest entry)
+        self._size = 0
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.verse_mismatches = 0  # similar enough, but search picked another verse
+        self._best_similarity = Counter()
+        self._hit_similarity = Counter()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, embedding, chapter, verse) -> dict | None:
+        """Return the stored answer of the closest paraphrase with the same top verse."""
+        query_vector = self._normalize(embedding)
+        with self._lock:
+            if not self._size:
+                self.misses += 1
+                return None
+            similarities = self._matrix[: self._size] @ query_vector
+            if self.max_age:
+                # Expired entries can never match; the ring buffer overwrites them in turn
+                expired = self._stored_at[: self._size] < time.time() - self.max_age
+                if expired.all():
+                    self.misses += 1
+                    return None
+                similarities[expired] = -np.inf
+            best = int(np.argmax(similarities))
+            self._best_similarity[_bucket(float(similarities[best]))] += 1
+
+            above = np.flatnonzero(similarities >= self.threshold)
+            for slot in above[np.argsort(-similarities[above])]:
+                entry = self._entries[slot]
+                if (entry["chapter"], entry["verse"]) == (chapter, verse):
+                    self.hits += 1
+                    self._hit_similarity[_bucket(float(similarities[slot]))] += 1
+                    return entry["answer"]
+            if len(above):
+                self.verse_mismatches += 1
+            self.misses += 1
+            return None
+
+    def add(self, query: str, embedding, answer: dict):
+        """Remember an answer, evicting the oldest entry when full."""
+        with self._lock:
+            slot = self._next
+            self._matrix[slot] = self._normalize(embedding)
+            self._stored_at[slot] = time.time()
+            self._entries[slot] = {
+                "query": query,
+                "chapter": answer["chapter"],
+                "verse": answer["verse"],
+                "answer": answer,
+            }
+            self._next = (slot + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def stats(self) -> dict:
+        """Hit rate plus similarity distributions for judging the threshold."""
+        lookups = self.hits + self.misses
+        return {
+            "size": self._size,
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "max_age_seconds": self.max_age,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            # High relative to hits means the threshold admits non-paraphrases
+            "verse_mismatches_above_threshold": self.verse_mismatches,
+            "best_similarity_histogram": dict(self._best_similarity),
+            "hit_similarity_histogram": dict(self._hit_similarity),
+        }
@@ -0,0 +1,293 @@
+"""
+Versioned on-disk snapshot of the verse corpus (metadata + embeddings).
+
+Layout of a snapshot directory:
+    manifest.json           format version, model, dimension, count, checksum, source,
+                            and the data directory holding this version's files
+    data-<checksum>/
+        embeddings.npy      (count, dimension) L2-normalized float32 matrix
+        columns/chapter.npy int32 chapter numbers
+        columns/<name>.utf8.npy
+                            UTF-8 bytes of every value of a text column, concatenated
+        columns/<name>.offsets.npy
+                            int64 offsets (count + 1); value i is utf8[offsets[i]:offsets[i+1]]
+
+Every .npy file is opened memory-mapped, so loading costs milliseconds and
+pages are shared between processes; text is only decoded when read.
+
+A rebuild never touches files a running server has mapped: the new version
+is written to its own data directory and becomes current when manifest.json
+is atomically replaced. Older data directories are removed once two newer
+ones exist (unlinking a mapped file is safe; truncating it is not).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+FORMAT_VERSION = 3
+MANIFEST_FILE = "manifest.json"
+DATA_DIR_PREFIX = "data-"
+EMBEDDINGS_FILE = "embeddings.npy"
+COLUMNS_DIR = "columns"
+TEXT_COLUMNS = ("id", "verse", "translation", "summary", "commentary")
+
+
+class StaleSnapshotError(Exception):
+    """The snapshot exists but does not match the running configuration."""
+
+
+class TextColumn:
+    """Read-only sequence of strings over memory-mapped offsets + UTF-8 bytes."""
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.data[self.offsets[i] : self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def tolist(self) -> list[str]:
+        return [self[i] for i in range(len(self))]
+
+
+def verse_value(label: str):
+    """Verse labels are ints, except grouped verses such as "8-12"."""
+    return int(label) if label.isdigit() else label
+
+
+def verse_label(verse) -> str:
+    if isinstance(verse, float) and verse.is_integer():
+        verse = int(verse)
+    return str(verse)
+
+
+class Snapshot:
+    """A loaded snapshot: manifest, embedding matrix and metadata columns."""
+
+    def __init__(self, path: str, manifest: dict, embeddings: np.ndarray,
+                 chapters: np.ndarray, columns: dict[str, TextColumn]):
+        self.path = path
+        self.manifest = manifest
+        self.embeddings = embeddings
+        self.chapters = chapters
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.chapters)
+
+    @property
+    def ids(self) -> list[str]:
+        return self.columns["id"].tolist()
+
+    @property
+    def version(self) -> str:
+        """Content checksum; changes whenever the corpus does."""
+        return self.manifest["checksum"]
+
+    def metadata(self) -> list[dict]:
+        """Per-verse metadata dicts, shaped like the Pinecone metadata."""
+        verses = self.columns["verse"]
+        translations = self.columns["translation"]
+        summaries = self.columns["summary"]
+        commentaries = self.columns["commentary"]
+        return [
+            {
+                "chapter": int(self.chapters[i]),
+                "verse": verse_value(verses[i]),
+                "translation": translations[i],
+                "summary": summaries[i],
+                "commentary": commentaries[i],
+            }
+            for i in range(len(self))
+        ]
+
+
+def _column_paths(directory: str, name: str) -> tuple[str, str]:
+    base = os.path.join(directory, name)
+    return f"{base}.offsets.npy", f"{base}.utf8.npy"
+
+
+def write_text_column(directory: str, name: str, values: list[str]) -> list[str]:
+    """Write one text column (offsets + UTF-8 bytes); returns the files written."""
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    offsets_path, data_path = _column_paths(directory, name)
+    np.save(offsets_path, offsets)
+    np.save(data_path, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    return [offsets_path, data_path]
+
+
+def load_text_column(directory: str, name: str) -> TextColumn:
+    """Memory-map a column written by write_text_column."""
+    offsets_path, data_path = _column_paths(directory, name)
+    return TextColumn(np.load(offsets_path, mmap_mode="r"), np.load(data_path, mmap_mode="r"))
+
+
+def content_hash(*parts) -> str:
+    """Stable hex digest of strings/bytes, for detecting changed content."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode("utf-8")
+        # Length prefix, so ("ab", "c") and ("a", "bc") differ
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def _checksum(paths: list[str]) -> str:
+    digest = hashlib.sha256()
+    for file_path in paths:
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def _data_files(data_dir: str) -> list[str]:
+    """Every file of a version, in checksum order."""
+    columns_dir = os.path.join(data_dir, COLUMNS_DIR)
+    files = [os.path.join(data_dir, EMBEDDINGS_FILE), os.path.join(columns_dir, "chapter.npy")]
+    for name in TEXT_COLUMNS:
+        files += _column_paths(columns_dir, name)
+    return files
+
+
+def _remove_old_versions(path: str, keep: int = 2):
+    """Delete all but the newest `keep` data directories."""
+    versions = sorted(
+        (entry for entry in os.scandir(path) if entry.is_dir() and entry.name.startswith(DATA_DIR_PREFIX)),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in versions[keep:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def write_snapshot(path: str, ids: list[str], embeddings, metadata: list[dict],
+                   source: str, model: str) -> dict:
+    """Write a new snapshot version into a directory and make it current; returns its manifest."""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.maximum(norms, 1e-12)
+
+    os.makedirs(path, exist_ok=True)
+    staging = os.path.join(path, f".tmp-{os.getpid()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(os.path.join(staging, COLUMNS_DIR))
+    np.save(os.path.join(staging, EMBEDDINGS_FILE), matrix)
+
+    chapter_path = os.path.join(staging, COLUMNS_DIR, "chapter.npy")
+    np.save(chapter_path, np.array([int(m["chapter"]) for m in metadata], dtype=np.int32))
+
+    values = {
+        "id": ids,
+        "verse": [verse_label(m["verse"]) for m in metadata],
+        "translation": [m.get("translation", "") for m in metadata],
+        "summary": [m.get("summary", "") for m in metadata],
+        "commentary": [m.get("commentary", "") for m in metadata],
+    }
+    for name in TEXT_COLUMNS:
+        write_text_column(os.path.join(staging, COLUMNS_DIR), name, values[name])
+
+    checksum = _checksum(_data_files(staging))
+    data_dir = DATA_DIR_PREFIX + checksum
+    if os.path.isdir(os.path.join(path, data_dir)):
+        # Same content as an existing version: keep the files servers may have mapped
+        shutil.rmtree(staging)
+        os.utime(os.path.join(path, data_dir))
+    else:
+        os.rename(staging, os.path.join(path, data_dir))
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "created_at": time.time(),
+        "source": source,
+        "model": model,
+        "dimension": int(matrix.shape[1]),
+        "count": len(ids),
+        "checksum": checksum,
+        "data": data_dir,
+    }
+    # Manifest last, replaced atomically: readers see the old version or the new one
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    with open(f"{manifest_path}.tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    _remove_old_versions(path)
+    return manifest
+
+
+def load_snapshot(path: str, model: str, dimension: int, max_age_seconds: float = 0,
+                  verify: bool = True) -> Snapshot:
+    """
+    Memory-map the current version of a snapshot directory.
+
+    Raises FileNotFoundError if it is missing or incomplete, and
+    StaleSnapshotError if it was built for another format, model or dimension,
+    is older than max_age_seconds (0 = no age limit), or (with verify) its
+    files do not match the manifest checksum.
+    """
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise StaleSnapshotError(f"format version {manifest.get('format_version')} != {FORMAT_VERSION}")
+    if manifest["model"] != model or manifest["dimension"] != dimension:
+        raise StaleSnapshotError(f"built for {manifest['model']} ({manifest['dimension']}-dim)")
+    if max_age_seconds and time.time() - manifest["created_at"] > max_age_seconds:
+        raise StaleSnapshotError(f"older than {max_age_seconds:.0f}s")
+
+    data_dir = os.path.join(path, manifest["data"])
+    # Reads every page once (a few MB); they stay in the page cache for the mmaps below
+    if verify and _checksum(_data_files(data_dir)) != manifest["checksum"]:
+        raise StaleSnapshotError("files do not match the manifest checksum")
+
+    embeddings = np.load(os.path.join(data_dir, EMBEDDINGS_FILE), mmap_mode="r")
+    chapters = np.load(os.path.join(data_dir, COLUMNS_DIR, "chapter.npy"), mmap_mode="r")
+    columns = {name: load_text_column(os.path.join(data_dir, COLUMNS_DIR), name) for name in TEXT_COLUMNS}
+    if len(embeddings) != manifest["count"] or len(chapters) != manifest["count"]:
+        raise StaleSnapshotError("row count does not match manifest")
+    return Snapshot(path, manifest, embeddings, chapters, columns)
+
+
+def fetch_from_pinecone(index, dimension: int, max_workers: int = 18):
+    """
+    Fetch every vector (values + metadata) from Pinecone.
+    Pinecone has no "fetch all", so each chapter is queried with a dummy
+    vector and a metadata filter - all 18 chapters in parallel.
+    """
+
+    def fetch_chapter(chapter_num: int):
+        results = index.query(
+            vector=[0] * dimension,
+            top_k=100,  # Max verses per chapter is 78 (chapter 18)
+            include_values=True,
+            include_metadata=True,
+            filter={"chapter": chapter_num},
+        )
+        logging.info(f"Chapter {chapter_num}: got {len(results['matches'])} verses")
+        return results["matches"]
+
+    ids, embeddings, metadata = [], [], []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for matches in executor.map(fetch_chapter, range(1, 19)):
+            for match in matches:
+                ids.append(match["id"])
+                embeddings.append(match["values"])
+                metadata.append(dict(match["metadata"]))
+    if not ids:
+        raise RuntimeError("Pinecone returned no vectors")
+    return ids, np.asarray(embeddings, dtype=np.float32), metadata
@@ -0,0 +1,134 @@
+"""
+Import-time and memory report for backend entry points and clients.
+Each probe runs in a fresh interpreter, so numbers reflect what a worker,
+cron job or one-off script actually pays.
+
+    python startup_report.py                      # default modules + clients
+    python startup_report.py --modules precompute_summaries --clients index
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+DEFAULT_MODULES = [
+    "config",
+    "clients",
+    "utils",
+    "main",
+    "model",
+    "precompute_summaries",
+    "fill_missing_commentary",
+    "build_snapshot",
+]
+DEFAULT_CLIENTS = [
+    "openai_client",
+    "async_openai_client",
+    "index",
+    "corpus_index",
+    "embedding_model",
+]
+# Heavy dependencies worth flagging when a module pulls them in
+HEAVY_MODULES = ["torch", "sentence_transformers", "onnxruntime", "pinecone", "openai"]
+
+
+def rss_mb() -> float:
+    """Current resident set size (falls back to peak RSS off Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def probe(kind: str, name: str):
+    """Runs inside the child: import a module or build a client, print JSON."""
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    if kind == "module":
+        __import__(name)
+    else:
+        import clients
+
+        rss_before = rss_mb()
+        started = time.perf_counter()
+        clients.warm_up(name)
+    print(json.dumps({
+        "seconds": round(time.perf_counter() - started, 3),
+        "rss_mb": round(rss_mb(), 1),
+        "rss_delta_mb": round(rss_mb() - rss_before, 1),
+        "heavy_imports": [m for m in HEAVY_MODULES if m in sys.modules],
+    }))
+
+
+def run_probe(kind: str, name: str) -> dict:
+    proc = subprocess.run(
+        [sys.executable, __file__, "--probe", kind, name],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module: str, top: int) -> list[tuple[str, float]]:
+    """Root packages by cumulative import time (python -X importtime)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    packages = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, package = (part.strip() for part in line[len("import time:"):].split("|"))
+        # Root packages only (numpy, not numpy.core), excluding the module itself
+        if "." not in package and package != module:
+            packages.append((package, int(cumulative) / 1e6))
+    return sorted(packages, key=lambda p: -p[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time and RSS report")
+    parser.add_argument("--modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--clients", nargs="*", default=DEFAULT_CLIENTS)
+    parser.add_argument("--importtime", metavar="MODULE", help="Show slowest imports of MODULE")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--probe", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        probe(*args.probe)
+        return
+
+    baseline = run_probe("module", "os")
+    print(f"Interpreter baseline: {baseline.get('rss_mb')} MB RSS\n")
+
+    print(f"{'import':<28}{'seconds':>9}{'RSS MB':>9}  heavy dependencies")
+    for module in args.modules:
+        r = run_probe("module", module)
+        if "error" in r:
+            print(f"{module:<28}  error: {r['error']}")
+            continue
+        print(f"{module:<28}{r['seconds']:>9.2f}{r['rss_mb']:>9.0f}  {', '.join(r['heavy_imports']) or '-'}")
+
+    print(f"\n{'client':<28}{'seconds':>9}{'+RSS MB':>9}")
+    for name in args.clients:
+        r = run_probe("client", name)
+        if "error" in r:
+            print(f"{name:<28}  error: {r['error']}")
+            continue
+        print(f"{name:<28}{r['seconds']:>9.2f}{r['rss_delta_mb']:>9.0f}")
+
+    if args.importtime:
+        print(f"\nSlowest imports for '{args.importtime}':")
+        for package, seconds in slowest_imports(args.importtime, args.top):
+            print(f"  {package:<30}{seconds:>8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# config.py requires the service keys at import; nothing here calls the services
+os.environ.setdefault("PINECONE_API_KEY", "test")
+os.environ.setdefault("PINECONE_INDEX", "test")
+os.environ.setdefault("GPT_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
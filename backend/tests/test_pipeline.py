@@ -0,0 +1,35 @@
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import pipeline
+from metrics import MetricsMiddleware, timed
+
+
+def blocking_stage():
+    with timed("executor_side"):
+        return "done"
+
+
+async def endpoint(request):
+    return PlainTextResponse(await pipeline.run_in_stage("cache", blocking_stage))
+
+
+def test_server_timing_includes_stages_timed_on_the_thread_pool():
+    app = MetricsMiddleware(Starlette(routes=[Route("/", endpoint)]))
+    with TestClient(app) as client:
+        response = client.get("/")
+    pipeline.shutdown()
+
+    assert response.text == "done"
+    assert "executor_side;dur=" in response.headers["server-timing"]
+
+
+def test_shutdown_resets_stage_limits_for_the_next_event_loop():
+    for _ in range(2):
+        app = MetricsMiddleware(Starlette(routes=[Route("/", endpoint)]))
+        with TestClient(app) as client:
+            assert client.get("/").text == "done"
+        pipeline.shutdown()
+        assert not pipeline._semaphores
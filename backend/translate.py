@@ -1,49 +1,208 @@
-import os
+"""
+Translate Sanskrit (Devanagari) translation/commentary fields in data/ to English.
+
+Every Devanagari string in the corpus is collected first, deduplicated and
+looked up in a persistent cache keyed by a hash of the source text; only
+the misses go to the Google Translate v2 API, many strings per request (the
+API takes repeated `q` values), with a bound on requests in flight and
+jittered retries. A verse file is only rewritten if its content changed.
+
+    python translate.py
+    python translate.py --dry-run
+    python translate.py --endpoint http://127.0.0.1:8100/language/translate/v2   # fake_services.py
+
+Needs GOOGLE_API_KEY (not checked by the stand-in).
+"""
+
+import argparse
+import asyncio
+import hashlib
 import json
+import os
+import random
 import re
-import requests
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import aiohttp
 from dotenv import load_dotenv
 
 load_dotenv()
 
-API_KEY = os.getenv('GOOGLE_API_KEY')
-GOOGLE_TRANSLATE_URL = 'https://translation.googleapis.com/language/translate/v2'
+API_KEY = os.getenv("GOOGLE_API_KEY")
+GOOGLE_TRANSLATE_URL = "https://translation.googleapis.com/language/translate/v2"
+DATA_DIR = "data"
+CACHE_PATH = "cache/translations.sqlite3"
+FIELDS = ("translation", "commentary")
+SOURCE, TARGET = "sa", "en"  # 'sa' is the ISO 639-1 code for Sanskrit
+
+# v2 limits: 128 strings per request; keep requests well under the size cap
+MAX_BATCH_STRINGS = 128
+MAX_BATCH_CHARS = 30000
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Keys per cache SELECT, under SQLite's bound-parameter limit
+LOOKUP_CHUNK = 500
 
 # Regular expression to detect Sanskrit (Devanagari script) characters
-devanagari_regex = re.compile(r'[\u0900-\u097F]')
+devanagari_regex = re.compile(r"[\u0900-\u097F]")
+
 
 def contains_devanagari(text):
     return devanagari_regex.search(text) is not None
 
-def translate_to_english(text):
-    params = {
-        'q': text,
-        'source': 'sa',  # 'sa' is the ISO 639-1 code for Sanskrit
-        'target': 'en',  # 'en' for English
-        'key': API_KEY
-    }
-    response = requests.get(GOOGLE_TRANSLATE_URL, params=params)
-    result = response.json()
-    return result['data']['translations'][0]['translatedText']
 
-data_folder = 'data'
+def text_key(text: str) -> str:
+    return hashlib.sha256(f"{SOURCE}>{TARGET}|{text}".encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """SQLite store of translations keyed by hash(source language, target language, text)."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations "
+            "(key TEXT PRIMARY KEY, translated TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+
+    def get_many(self, texts: list[str]) -> dict[str, str]:
+        found = {}
+        for start in range(0, len(texts), LOOKUP_CHUNK):
+            by_key = {text_key(text): text for text in texts[start : start + LOOKUP_CHUNK]}
+            rows = self.conn.execute(
+                f"SELECT key, translated FROM translations WHERE key IN ({','.join('?' * len(by_key))})",
+                list(by_key),
+            )
+            for key, translated in rows:
+                found[by_key[key]] = translated
+        return found
+
+    def put_many(self, translations: dict[str, str]):
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?)",
+                [(text_key(text), translated, now) for text, translated in translations.items()],
+            )
+
+
+def make_batches(texts: list[str], max_strings: int, max_chars: int) -> list[list[str]]:
+    """Pack texts into requests of at most max_strings strings / max_chars characters."""
+    batches, current, size = [], [], 0
+    for text in texts:
+        if current and (len(current) >= max_strings or size + len(text) > max_chars):
+            batches.append(current)
+            current, size = [], 0
+        current.append(text)
+        size += len(text)
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def translate_batch(session: aiohttp.ClientSession, endpoint: str, texts: list[str],
+                          semaphore: asyncio.Semaphore, retries: int) -> list[str]:
+    """One v2 request for many strings; results are in request order."""
+    form = [("q", text) for text in texts] + [
+        ("source", SOURCE),
+        ("target", TARGET),
+        ("format", "text"),  # plain text back, not HTML-escaped
+    ]
+    # The key is a query parameter (as documented), not a form field
+    params = {"key": API_KEY or ""}
+    for attempt in range(retries + 1):
+        try:
+            async with semaphore:
+                async with session.post(endpoint, params=params, data=form) as response:
+                    if response.status not in RETRYABLE_STATUSES:
+                        response.raise_for_status()
+                        result = await response.json()
+                        return [t["translatedText"] for t in result["data"]["translations"]]
+                    error = aiohttp.ClientResponseError(response.request_info, response.history, status=response.status)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            error = e
+        if attempt == retries:
+            raise error
+        await asyncio.sleep(random.uniform(0, 0.5 * 2**attempt))
+
+
+def load_files(data_dir: str) -> dict[Path, tuple[str, dict]]:
+    """Every verse file: path -> (raw text, parsed JSON)."""
+    files = {}
+    for path in sorted(Path(data_dir).glob("*/*.json")):
+        raw = path.read_text(encoding="utf-8")
+        files[path] = (raw, json.loads(raw))
+    return files
+
 
-for chapter_folder in os.listdir(data_folder):
-    chapter_path = os.path.join(data_folder, chapter_folder)
+async def main(args) -> int:
+    started = time.perf_counter()
+    files = load_files(args.data_dir)
+    sources = sorted(
+        {
+            verse_data[field]
+            for _, verse_data in files.values()
+            for field in FIELDS
+            if contains_devanagari(verse_data.get(field) or "")
+        }
+    )
+    cache = TranslationCache(args.cache)
+    translations = cache.get_many(sources)
+    missing = [text for text in sources if text not in translations]
+    batches = make_batches(missing, args.batch_strings, args.batch_chars)
+    print(
+        f"{len(files)} files, {len(sources)} distinct Devanagari strings: "
+        f"{len(translations)} cached, {len(missing)} to translate in {len(batches)} requests"
+    )
+    if args.dry_run:
+        return 0
 
-    if os.path.isdir(chapter_path):
-        for json_file in os.listdir(chapter_path):
-            file_path = os.path.join(chapter_path, json_file)
-            with open(file_path, 'r') as f:
-                verse_data = json.load(f)
+    failed = 0
+    if batches:
+        semaphore = asyncio.Semaphore(args.concurrency)
+        timeout = aiohttp.ClientTimeout(total=args.timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            tasks = [translate_batch(session, args.endpoint, batch, semaphore, args.retries) for batch in batches]
+            for batch, result in zip(batches, await asyncio.gather(*tasks, return_exceptions=True)):
+                if isinstance(result, Exception):
+                    print(f"Batch of {len(batch)} strings failed: {result!r}")
+                    failed += len(batch)
+                    continue
+                translated = dict(zip(batch, result))
+                cache.put_many(translated)
+                translations.update(translated)
 
-            if contains_devanagari(verse_data['translation']):
-                verse_data['translation'] = translate_to_english(verse_data['translation'])
+    written = 0
+    for path, (raw, verse_data) in files.items():
+        for field in FIELDS:
+            if verse_data.get(field) in translations:
+                verse_data[field] = translations[verse_data[field]]
+        content = json.dumps(verse_data, ensure_ascii=False, indent=4)
+        if content != raw:
+            path.write_text(content, encoding="utf-8")
+            written += 1
 
-            if contains_devanagari(verse_data['commentary']):
-                verse_data['commentary'] = translate_to_english(verse_data['commentary'])
+    print(
+        f"Translation from Sanskrit to English completed in {time.perf_counter() - started:.1f}s: "
+        f"{len(missing) - failed} strings translated, {written} files rewritten"
+        + (f", {failed} strings failed (re-run to retry)" if failed else "")
+    )
+    return 1 if failed else 0
 
-            with open(file_path, 'w') as f:
-                json.dump(verse_data, f, ensure_ascii=False, indent=4)
 
-print("Translation from Sanskrit to English completed.")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--endpoint", default=GOOGLE_TRANSLATE_URL)
+    parser.add_argument("--cache", default=CACHE_PATH, help="persistent translation cache (SQLite)")
+    parser.add_argument("--concurrency", type=int, default=4, help="max requests in flight")
+    parser.add_argument("--batch-strings", type=int, default=MAX_BATCH_STRINGS)
+    parser.add_argument("--batch-chars", type=int, default=MAX_BATCH_CHARS)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60, help="seconds per request")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be translated")
+    sys.exit(asyncio.run(main(parser.parse_args())))
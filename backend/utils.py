@@ -2,11 +2,38 @@
 Shared utility functions for GitaChat backend.
 """
 
-import os
-import pickle
+import logging
+import random
+import time
 from pathlib import Path
-from config import EMBEDDINGS_FOLDER, BATCH_SIZE
-from clients import openai_client, index
+from config import (
+    BATCH_SIZE,
+    COMMENTARY_CACHE_PATH,
+    COMMENTARY_CACHE_MAX_ENTRIES,
+    COMMENTARY_CACHE_MAX_AGE_SECONDS,
+)
+import clients
+from commentary_cache import CommentaryCache
+from metrics import record_cache, timed
+from pipeline import run_in_stage, stage_limit
+
+# Bump whenever summarize's prompt changes, so precompute_summaries regenerates summaries
+SUMMARY_PROMPT_VERSION = "1"
+
+# Bump whenever build_contextual_prompt changes, so cached commentary is regenerated
+CONTEXTUAL_PROMPT_VERSION = "1"
+
+# Generated commentary by (normalized query, chapter, verse); None when disabled
+commentary_cache = (
+    CommentaryCache(
+        COMMENTARY_CACHE_PATH,
+        max_entries=COMMENTARY_CACHE_MAX_ENTRIES,
+        max_age_seconds=COMMENTARY_CACHE_MAX_AGE_SECONDS,
+        version=f"gpt-4o-mini:{CONTEXTUAL_PROMPT_VERSION}",
+    )
+    if COMMENTARY_CACHE_PATH
+    else None
+)
 
 
 def summarize(commentary_text: str) -> str:
@@ -14,7 +41,7 @@ def summarize(commentary_text: str) -> str:
     if not commentary_text or len(commentary_text) < 10:
         return ""
 
-    response = openai_client.chat.completions.create(
+    response = clients.openai_client.chat.completions.create(
         model="gpt-4o-mini",
         messages=[
             {
@@ -31,23 +58,14 @@ def summarize(commentary_text: str) -> str:
     return response.choices[0].message.content.strip()
 
 
-def generate_contextual_commentary(query: str, verse: dict) -> str:
-    """
-    Generate commentary that specifically addresses the user's question.
-
-    Args:
-        query: The user's original question
-        verse: Dict with chapter, verse, translation, and optionally full_commentary/summarized_commentary
-
-    Returns:
-        Contextual commentary string tailored to the user's question
-    """
+def build_contextual_prompt(query: str, verse: dict) -> str:
+    """Build the prompt asking GPT to relate a verse to the user's question."""
     # Get available commentary for context
     commentary_context = verse.get("full_commentary") or verse.get("summarized_commentary") or ""
     if commentary_context:
         commentary_context = f"\n\nTraditional commentary for context:\n{commentary_context[:1500]}"
 
-    prompt = f"""The user asked: "{query}"
+    return f"""The user asked: "{query}"
 
 The most relevant verse from the Bhagavad Gita is Chapter {verse['chapter']}, Verse {verse['verse']}:
 "{verse['translation']}"{commentary_context}
@@ -59,22 +77,103 @@ Write a 2-3 paragraph response that:
 
 Vary your opening - don't start with "This verse...". Keep it concise but meaningful."""
 
-    response = openai_client.chat.completions.create(
+
+def generate_contextual_commentary(query: str, verse: dict) -> str:
+    """
+    Generate commentary that specifically addresses the user's question.
+
+    Args:
+        query: The user's original question
+        verse: Dict with chapter, verse, translation, and optionally full_commentary/summarized_commentary
+
+    Returns:
+        Contextual commentary string tailored to the user's question
+    """
+    response = clients.openai_client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": build_contextual_prompt(query, verse)}],
+        max_tokens=500,
+        temperature=0.7,
+    )
+    return response.choices[0].message.content.strip()
+
+
+def stream_contextual_commentary(query: str, verse: dict):
+    """
+    Stream contextual commentary token by token.
+
+    Same prompt as generate_contextual_commentary, but yields text deltas
+    as they arrive from OpenAI instead of waiting for the full completion.
+    """
+    stream = clients.openai_client.chat.completions.create(
         model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
+        messages=[{"role": "user", "content": build_contextual_prompt(query, verse)}],
         max_tokens=500,
         temperature=0.7,
+        stream=True,
     )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+async def generate_contextual_commentary_async(query: str, verse: dict) -> str:
+    """Async generate_contextual_commentary(), bounded by the LLM stage limit."""
+    with timed("llm"):
+        async with stage_limit("llm"):
+            response = await clients.async_openai_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{"role": "user", "content": build_contextual_prompt(query, verse)}],
+                max_tokens=500,
+                temperature=0.7,
+            )
     return response.choices[0].message.content.strip()
 
 
-def load_verses_from_pickle():
-    """Load verses and embeddings from pickle files."""
-    with open(os.path.join(EMBEDDINGS_FOLDER, "verses.pkl"), "rb") as f:
-        verses = pickle.load(f)
-    with open(os.path.join(EMBEDDINGS_FOLDER, "embeddings.pkl"), "rb") as f:
-        embeddings = pickle.load(f)
-    return verses, embeddings
+async def get_cached_commentary(query: str, verse: dict) -> str | None:
+    """Look up previously generated commentary for this query and verse."""
+    if commentary_cache is None:
+        return None
+    try:
+        with timed("cache"):
+            cached = await run_in_stage(
+                "cache", commentary_cache.get, query, verse["chapter"], verse["verse"]
+            )
+    except Exception as e:
+        logging.warning(f"Commentary cache read failed: {e}")
+        return None
+    record_cache("commentary", cached is not None)
+    return cached
+
+
+async def cache_commentary(query: str, verse: dict, commentary: str):
+    """Store generated commentary for repeat questions."""
+    if commentary_cache is None or not commentary:
+        return
+    try:
+        with timed("cache"):
+            await run_in_stage(
+                "cache", commentary_cache.put, query, verse["chapter"], verse["verse"], commentary
+            )
+    except Exception as e:
+        logging.warning(f"Commentary cache write failed: {e}")
+
+
+async def stream_contextual_commentary_async(query: str, verse: dict):
+    """Async stream_contextual_commentary(), bounded by the LLM stage limit."""
+    # Timed up to the last token; it lands in the histogram, not Server-Timing
+    with timed("llm"):
+        async with stage_limit("llm"):
+            stream = await clients.async_openai_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{"role": "user", "content": build_contextual_prompt(query, verse)}],
+                max_tokens=500,
+                temperature=0.7,
+                stream=True,
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
 
 
 def load_verses_from_json(data_dir: str = "data"):
@@ -96,4 +195,17 @@ def batch_upsert(vectors: list, batch_size: int = BATCH_SIZE):
     """Upload vectors to Pinecone in batches."""
     for i in range(0, len(vectors), batch_size):
         batch = vectors[i : i + batch_size]
-        index.upsert(vectors=batch)
+        clients.index.upsert(vectors=batch)
+
+
+def with_retries(fn, *args, attempts: int = 4, base_delay: float = 1.0, **kwargs):
+    """Call fn, retrying failures with jittered exponential backoff; re-raises the last error."""
+    for attempt in range(attempts):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == attempts - 1:
+                raise
+            delay = base_delay * 2**attempt * random.uniform(0.5, 1.5)
+            logging.warning(f"{getattr(fn, '__name__', 'call')} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
@@ -0,0 +1,112 @@
+"""
+In-process exact vector index for GitaChat.
+Holds the whole corpus (~700 x 768) as one pre-normalized float32 matrix and
+answers queries with a brute-force dot product. Query responses mirror the
+shape of Pinecone's, so callers can use either backend interchangeably.
+"""
+
+import numpy as np
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row, leaving all-zero rows untouched."""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _matches_condition(value, condition) -> bool:
+    """Evaluate a single Pinecone-style metadata filter condition."""
+    if not isinstance(condition, dict):
+        return value == condition
+    for op, operand in condition.items():
+        if op == "$eq" and value != operand:
+            return False
+        if op == "$ne" and value == operand:
+            return False
+        if op == "$in" and value not in operand:
+            return False
+        if op == "$nin" and value in operand:
+            return False
+    return True
+
+
+class LocalIndex:
+    """Exact cosine-similarity search over an in-memory embedding matrix."""
+
+    def __init__(self, ids: list[str], embeddings, metadata: list[dict], normalized: bool = False):
+        if not (len(ids) == len(embeddings) == len(metadata)):
+            raise ValueError("ids, embeddings and metadata must have the same length")
+        self.ids = list(ids)
+        self.metadata = list(metadata)
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        # Snapshot matrices are stored normalized; use them as-is (no copy, stays mmapped)
+        self.matrix = matrix if normalized else _normalize_rows(matrix)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _filter_mask(self, filter: dict) -> np.ndarray:
+        """Boolean mask of rows whose metadata satisfies every filter field."""
+        return np.array(
+            [
+                all(_matches_condition(meta.get(field), cond) for field, cond in filter.items())
+                for meta in self.metadata
+            ],
+            dtype=bool,
+        )
+
+    def _top_matches(self, scores: np.ndarray, top_k: int, include_metadata: bool,
+                     include_values: bool) -> dict:
+        """Pinecone-shaped response for the top_k entries of one row of scores."""
+        candidates = int(np.isfinite(scores).sum())
+        k = min(top_k, candidates)
+        if k <= 0:
+            return {"matches": []}
+
+        # argpartition is O(n); only the k survivors need a full sort
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        matches = []
+        for i in top:
+            match = {"id": self.ids[i], "score": float(scores[i])}
+            if include_metadata:
+                match["metadata"] = self.metadata[i]
+            if include_values:
+                match["values"] = self.matrix[i].tolist()
+            matches.append(match)
+        return {"matches": matches}
+
+    def query(
+        self,
+        vector,
+        top_k: int = 10,
+        include_metadata: bool = False,
+        include_values: bool = False,
+        filter: dict | None = None,
+        **kwargs,
+    ) -> dict:
+        """Return the top_k rows by cosine similarity, in Pinecone's response shape."""
+        return self.query_many(
+            [vector], top_k, include_metadata, include_values, filter
+        )[0]
+
+    def query_many(
+        self,
+        vectors,
+        top_k: int = 10,
+        include_metadata: bool = False,
+        include_values: bool = False,
+        filter: dict | None = None,
+    ) -> list[dict]:
+        """query() for many vectors at once: one (queries x corpus) matrix product."""
+        queries = _normalize_rows(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        scores = queries @ self.matrix.T
+
+        if filter:
+            scores = np.where(self._filter_mask(filter), scores, -np.inf)
+        return [
+            self._top_matches(row, top_k, include_metadata, include_values)
+            for row in scores
+        ]
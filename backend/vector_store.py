@@ -0,0 +1,200 @@
+"""
+Resilient access to the hosted Pinecone index for GitaChat.
+Wraps an index with per-call deadlines, jittered retries, optional hedged
+requests and a circuit breaker. While Pinecone is unhealthy (or a call fails
+for good), queries are answered by a fallback index instead - the in-memory
+corpus loaded from the snapshot.
+"""
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from metrics import record_fallback
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; lets one trial call through after a cool-down."""
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go to the primary right now."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                # Half-open: one trial call decides whether to close again
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                    logging.warning(f"Vector store circuit opened after {self.failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Timeouts, connection errors, throttling and 5xx are worth retrying; other 4xx are not."""
+    status = getattr(error, "status", None)
+    return status is None or status == 429 or status >= 500
+
+
+class ResilientIndex:
+    """Pinecone-compatible query() with deadlines, retries, hedging and a fallback index."""
+
+    def __init__(
+        self,
+        index,
+        fallback=None,
+        timeout_ms: float = 800,
+        deadline_ms: float = 2000,
+        retries: int = 2,
+        backoff_ms: float = 50,
+        hedge_after_ms: float = 0,
+        breaker: CircuitBreaker | None = None,
+        max_workers: int = 32,
+    ):
+        self.index = index
+        self.fallback = fallback
+        self.timeout = timeout_ms / 1000
+        self.deadline = deadline_ms / 1000
+        self.retries = retries
+        self.backoff = backoff_ms / 1000
+        self.hedge_after = hedge_after_ms / 1000
+        self.breaker = breaker or CircuitBreaker()
+        self.max_workers = max_workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(
+            ("calls", "attempts", "retries", "timeouts", "errors", "hedges", "hedge_wins",
+             "failures", "fallbacks", "circuit_open"),
+            0,
+        )
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Created on first use, so each (forked) worker process gets its own
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="gitachat-pinecone"
+                    )
+        return self._executor
+
+    def _submit(self, kwargs: dict, timeout: float):
+        self._count("attempts")
+        # The HTTP read timeout frees the worker thread once the attempt is abandoned
+        return self._pool().submit(self.index.query, **kwargs, _request_timeout=timeout)
+
+    def _attempt(self, kwargs: dict, timeout: float):
+        """One logical attempt: a request, plus a hedged duplicate if it is slow."""
+        started = time.monotonic()
+        end = started + timeout
+        first = self._submit(kwargs, timeout)
+        pending = {first}
+        hedged = not self.hedge_after or self.hedge_after >= timeout
+        error = None
+        while pending:
+            now = time.monotonic()
+            if now >= end:
+                break
+            wait_for = end - now if hedged else min(end, started + self.hedge_after) - now
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+            if not done and not hedged:
+                # Slow first request: race a second one for the rest of the attempt
+                hedged = True
+                self._count("hedges")
+                pending.add(self._submit(kwargs, end - time.monotonic()))
+        if error is None:
+            self._count("timeouts")
+            raise TimeoutError(f"Vector store query timed out after {timeout * 1000:.0f}ms")
+        raise error
+
+    def query(self, **kwargs):
+        """Same arguments and response shape as Index.query()."""
+        self._count("calls")
+        if not self.breaker.allow():
+            self._count("circuit_open")
+            return self._fallback_query(kwargs, RuntimeError("circuit open"))
+
+        deadline = time.monotonic() + self.deadline
+        error = None
+        for attempt in range(self.retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if attempt:
+                self._count("retries")
+            try:
+                result = self._attempt(kwargs, min(self.timeout, remaining))
+                self.breaker.record_success()
+                return result
+            except Exception as e:
+                error = e
+                if not isinstance(e, TimeoutError):
+                    self._count("errors")
+                if not _is_retryable(e) or attempt == self.retries:
+                    break
+            # Full jitter: spreads retries from many workers over the backoff window
+            pause = random.uniform(0, self.backoff * 2**attempt)
+            time.sleep(max(0.0, min(pause, deadline - time.monotonic())))
+
+        self._count("failures")
+        self.breaker.record_failure()
+        return self._fallback_query(kwargs, error)
+
+    def _fallback_query(self, kwargs: dict, error: Exception):
+        if self.fallback is None:
+            raise error
+        self._count("fallbacks")
+        record_fallback("vector_store")
+        # Pinecone API errors stringify with full response headers; the status is enough
+        status = getattr(error, "status", None)
+        reason = f"HTTP {status}" if status else str(error)
+        logging.warning(f"Vector store unavailable ({type(error).__name__}: {reason}), using fallback index")
+        return self.fallback.query(**kwargs)
+
+    def __getattr__(self, name: str):
+        # upsert(), fetch(), describe_index_stats(), ... go straight to the index
+        return getattr(self.index, name)
+
+    def stats(self) -> dict:
+        """Call outcome counters and circuit breaker state."""
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            **counts,
+            "circuit": self.breaker.state,
+            "circuit_times_opened": self.breaker.times_opened,
+        }
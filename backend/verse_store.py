@@ -0,0 +1,68 @@
+"""
+In-memory verse store for GitaChat.
+Built once at startup from the corpus index, it answers lookups by
+(chapter, verse) and by vector id in O(1), including verses that live inside
+grouped ids such as ch13_v8-12.
+"""
+
+import re
+
+VECTOR_ID_PATTERN = re.compile(r"^ch(\d+)_v(\d+)(?:-(\d+))?$")
+
+
+def verse_numbers(vector_id: str, metadata: dict) -> range:
+    """Verse numbers covered by a record, e.g. ch13_v8-12 -> 8..12."""
+    found = VECTOR_ID_PATTERN.match(vector_id)
+    if found:
+        start = int(found.group(2))
+        end = int(found.group(3) or start)
+        return range(start, end + 1)
+    # Unknown id scheme: fall back to the metadata verse (8, 8.0 or "8-12")
+    verse = metadata["verse"]
+    if isinstance(verse, (int, float)):
+        return range(int(verse), int(verse) + 1)
+    start, _, end = str(verse).partition("-")
+    return range(int(start), int(end or start) + 1)
+
+
+class VerseStore:
+    """Verse metadata keyed by vector id and by every (chapter, verse) it covers."""
+
+    def __init__(self, ids: list[str], metadata: list[dict]):
+        self._by_id: dict[str, dict] = {}
+        self._by_key: dict[tuple[int, int], dict] = {}
+        ordered = []
+        for vector_id, meta in zip(ids, metadata):
+            numbers = verse_numbers(vector_id, meta)
+            self._by_id[vector_id] = meta
+            for number in numbers:
+                self._by_key[(int(meta["chapter"]), number)] = meta
+            ordered.append(((int(meta["chapter"]), numbers.start), meta))
+        ordered.sort(key=lambda item: item[0])
+        self._verses = [meta for _, meta in ordered]
+
+        # Payload for /api/all-verses, built once instead of per request
+        self._summaries = [
+            {
+                "chapter": meta["chapter"],
+                "verse": meta["verse"],
+                "translation": meta["translation"],
+                "summary": meta.get("summary", "")[:500],
+            }
+            for meta in self._verses
+        ]
+
+    def __len__(self) -> int:
+        return len(self._verses)
+
+    def get(self, chapter: int, verse: int) -> dict | None:
+        """Metadata for the record containing chapter:verse, if any."""
+        return self._by_key.get((chapter, verse))
+
+    def get_by_id(self, vector_id: str) -> dict | None:
+        """Metadata for a vector id as returned by the search index."""
+        return self._by_id.get(vector_id)
+
+    def summaries(self) -> list[dict]:
+        """Chapter, verse, translation and truncated summary for every verse, in order."""
+        return self._summaries
@@ -0,0 +1,79 @@
+"""
+On-disk verse corpus for the batch scripts: a columnar verse file plus a
+memory-mapped embedding matrix, replacing verses.pkl / embeddings.pkl.
+
+Layout of the embeddings folder (EMBEDDINGS_FOLDER):
+    embeddings.npy          (count, dimension) float32 or float16 matrix
+    embeddings.json         model, instruction, dtype, dimension, count, ids
+    verses/chapter.npy      int32 chapter numbers
+    verses/<name>.utf8.npy / verses/<name>.offsets.npy
+                            text columns verse, translation, commentary, summary
+                            (same encoding as the snapshot, see snapshot.py)
+
+Row i of the matrix belongs to verse i. Everything is opened memory-mapped,
+so loading is near-instant, pages are shared between processes and text is
+only decoded when read; unlike pickle, loading never executes code.
+Convert the old pickles once with convert_pickles.py.
+"""
+
+import os
+
+import numpy as np
+
+from embedding_matrix import load_embedding_matrix
+from snapshot import TextColumn, load_text_column, verse_label, verse_value, write_text_column
+
+# As config.EMBEDDINGS_FOLDER (config needs the service keys, this module does not)
+EMBEDDINGS_FOLDER = "embeddings"
+VERSES_DIR = "verses"
+VERSE_COLUMNS = ("verse", "translation", "commentary", "summary")
+
+
+class VerseTable:
+    """Read-only sequence of verse dicts over memory-mapped columns."""
+
+    def __init__(self, chapters: np.ndarray, columns: dict[str, TextColumn]):
+        self.chapters = chapters
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.chapters)
+
+    def __getitem__(self, i: int) -> dict:
+        return {
+            "chapter": int(self.chapters[i]),
+            "verse": verse_value(self.columns["verse"][i]),
+            "translation": self.columns["translation"][i],
+            "commentary": self.columns["commentary"][i],
+            "summary": self.columns["summary"][i],
+        }
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+def write_verses(folder: str, verses: list[dict]):
+    """Write the columnar verse file for a list of verse dicts."""
+    directory = os.path.join(folder, VERSES_DIR)
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, "chapter.npy"), np.array([int(v["chapter"]) for v in verses], dtype=np.int32))
+    write_text_column(directory, "verse", [verse_label(v["verse"]) for v in verses])
+    for name in VERSE_COLUMNS[1:]:
+        write_text_column(directory, name, [v.get(name) or "" for v in verses])
+
+
+def load_verses(folder: str = EMBEDDINGS_FOLDER) -> VerseTable:
+    directory = os.path.join(folder, VERSES_DIR)
+    chapters = np.load(os.path.join(directory, "chapter.npy"), mmap_mode="r")
+    return VerseTable(chapters, {name: load_text_column(directory, name) for name in VERSE_COLUMNS})
+
+
+def load_corpus(folder: str = EMBEDDINGS_FOLDER) -> tuple[VerseTable, np.ndarray]:
+    """Verses and their (memory-mapped) embeddings, row-aligned."""
+    verses = load_verses(folder)
+    embeddings, _ = load_embedding_matrix(folder)
+    if len(embeddings) != len(verses):
+        raise ValueError(
+            f"{folder}: {len(embeddings)} embeddings for {len(verses)} verses - re-run embed_corpus.py"
+        )
+    return verses, embeddings
@@ -88,7 +88,12 @@ export async function POST(req: Request) {
         );
     }
 
-    return NextResponse.json(responseData);
+    // Pass the backend's per-stage breakdown (embed, search, llm, ...) through
+    const serverTiming = response.headers.get("server-timing");
+    return NextResponse.json(
+      responseData,
+      serverTiming ? { headers: { "Server-Timing": serverTiming } } : undefined
+    );
   } catch (err) {
     // Log detailed error server-side only
     console.error("Query error:", err instanceof Error ? err.message : err);
@@ -18,7 +18,7 @@ export async function POST(req: Request) {
       return NextResponse.json({ error: "Missing chapter or verse" }, { status: 400 });
     }
 
-    if (chapter < 1 || chapter > 18 || verse < 1) {
+    if (!Number.isInteger(chapter) || !Number.isInteger(verse) || chapter < 1 || chapter > 18 || verse < 1) {
       return NextResponse.json({ error: "Invalid chapter or verse" }, { status: 400 });
     }
 
@@ -26,10 +26,9 @@ export async function POST(req: Request) {
     const controller = new AbortController();
     const timeout = setTimeout(() => controller.abort(), 15000);
     try {
-      const response = await fetch(`${backendUrl}/api/verse`, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ chapter, verse }),
+      // GET variant is cacheable: verses only change when the corpus is rebuilt
+      const response = await fetch(`${backendUrl}/api/verse/${chapter}/${verse}`, {
+        next: { revalidate: 3600 },
         signal: controller.signal,
       });
 